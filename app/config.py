@@ -42,9 +42,16 @@ class Settings(BaseSettings):
     password_require_lowercase: bool = os.getenv("PASSWORD_REQUIRE_LOWERCASE", "True").lower() == "true"
     password_require_digit: bool = os.getenv("PASSWORD_REQUIRE_DIGIT", "True").lower() == "true"
     password_require_special: bool = os.getenv("PASSWORD_REQUIRE_SPECIAL", "True").lower() == "true"
+    # Configurazioni del pool di connessioni (solo PostgreSQL)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
     # Configurazioni per caching
     cache_enabled: bool = os.getenv("CACHE_ENABLED", "True").lower() == "true"
     cache_expire_seconds: int = int(os.getenv("CACHE_EXPIRE_SECONDS", "60"))
+    stats_cache_expire_seconds: int = int(os.getenv("STATS_CACHE_EXPIRE_SECONDS", "300"))
+    # False quando /static è servito direttamente da un reverse proxy (nginx/Caddy)
+    serve_static: bool = os.getenv("SERVE_STATIC", "True").lower() == "true"
     # Security settings
     csrf_secret: str = os.getenv("CSRF_SECRET", secrets.token_hex(32))
     csrf_token_expire_minutes: int = int(os.getenv("CSRF_TOKEN_EXPIRE_MINUTES", "60"))
@@ -61,13 +61,24 @@ else:
 
 # Create the main database engine for the application using the URL from settings
 normalized_url = normalize_database_url(settings.database_url)
+
+# Dimensionamento del pool: con molte richieste concorrenti il default (5 + 10) satura subito
+pool_options = {}
+if "postgresql" in normalized_url:
+    pool_options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
 engine = create_engine(
     normalized_url,
     connect_args={"check_same_thread": False} if "sqlite" in normalized_url else {},
     # Il parametro isolation_level va FUORI da connect_args
     isolation_level="READ COMMITTED" if "postgresql" in normalized_url else "SERIALIZABLE",
     pool_pre_ping=True,
-    pool_recycle=3600
+    pool_recycle=3600,
+    **pool_options
 )
 
 # Modificare SessionLocal per ottimizzare la gestione delle transazioni
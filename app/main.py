@@ -16,6 +16,7 @@ from starlette.responses import RedirectResponse
 from app.config import settings
 from app.routers import apartments, tenants, leases, utilities, auth, users, documents
 from app.routers import settings as settings_router
+from app.services.service import warm_upload_dirs
 logger = logging.getLogger(__name__)
 
 # Debug import invoices
@@ -49,6 +50,9 @@ os.makedirs("static/apartments", exist_ok=True)
 os.makedirs("static/tenants", exist_ok=True)
 os.makedirs("static/leases", exist_ok=True)
 
+# Directory di upload per entità già esistenti: evitano os.makedirs al primo upload
+logger.info(f"Directory di upload registrate: {warm_upload_dirs()}")
+
 # Configurazione API FastAPI con opzioni personalizzate per Swagger
 app = FastAPI(
     title="Property Management API",
@@ -315,8 +319,9 @@ app.add_middleware(
 
 logger.info(f"CORS configurato per domini: {settings.cors_origins_list}")
 
-# Serve static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Serve static files (disattivabile se /static è servito dal reverse proxy)
+if settings.serve_static:
+    app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Include routers
 logger.info("Registrazione router apartments...")
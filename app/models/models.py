@@ -1,12 +1,48 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, Float, Date, DateTime, JSON, Enum, Numeric, BigInteger
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, Float, Date, DateTime, JSON, Enum, Numeric, BigInteger, Index, DDL, event, or_, text
 from sqlalchemy.orm import relationship
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
 import enum
 import time
 from datetime import datetime, date
 
 from app.database import Base
 
+class utcnow(FunctionElement):
+    """Ora corrente in UTC lato DB, coerente con i default Python datetime.utcnow.
+
+    Su PostgreSQL now() è nel fuso della sessione: in una colonna DateTime naive va
+    convertito esplicitamente in UTC. CURRENT_TIMESTAMP di SQLite è già UTC.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+# Estensione necessaria per gli indici trigram (ricerche ILIKE '%...%') su PostgreSQL
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+def trgm_index(name: str, column: str) -> Index:
+    """Indice GIN trigram su una colonna testuale, creato solo su PostgreSQL."""
+    return Index(
+        name,
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"}
+    ).ddl_if(dialect="postgresql")
+
 # Tabella per gestire il riutilizzo degli ID
 class FreeId(Base):
     __tablename__ = "free_ids"
@@ -141,6 +177,10 @@ class RefreshToken(Base):
 
 class Apartment(Base):
     __tablename__ = "apartments"
+    __table_args__ = (
+        trgm_index("ix_apartments_name_trgm", "name"),
+        trgm_index("ix_apartments_description_trgm", "description"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey("users.id"), nullable=False)  # Multi-tenancy
@@ -161,7 +201,7 @@ class Apartment(Base):
     images = Column(JSON, nullable=True)  # Array di URL di immagini
     hasLaundry = Column(Boolean, default=False)
     createdAt = Column(DateTime, default=datetime.utcnow)
-    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updatedAt = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=utcnow())
     deletedAt = Column(DateTime, nullable=True)  # Per soft delete
 
     # Relazione con User (nuova per multi-tenancy)
@@ -197,6 +237,12 @@ class MaintenanceRecord(Base):
 
 class Tenant(Base):
     __tablename__ = "tenants"
+    __table_args__ = (
+        trgm_index("ix_tenants_firstName_trgm", "firstName"),
+        trgm_index("ix_tenants_lastName_trgm", "lastName"),
+        trgm_index("ix_tenants_email_trgm", "email"),
+        trgm_index("ix_tenants_documentNumber_trgm", "documentNumber"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey("users.id"), nullable=False)  # Multi-tenancy
@@ -213,7 +259,7 @@ class Tenant(Base):
     communicationPreferences = Column(JSON)  # { email: true, sms: true, whatsapp: true }
     notes = Column(Text, nullable=True)
     createdAt = Column(DateTime, default=datetime.utcnow)
-    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updatedAt = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=utcnow())
     deletedAt = Column(DateTime, nullable=True)  # Per soft delete
 
     # Relazione con User (nuova per multi-tenancy)
@@ -239,8 +285,41 @@ class Tenant(Base):
             return f"{self.documentBackImage}?t={timestamp}"
         return None
 
+# Documento full-text per la ricerca dei tenant: la stessa espressione è usata
+# dall'indice GIN e dalle query, altrimenti PostgreSQL non userebbe l'indice
+TENANT_SEARCH_VECTOR_SQL = (
+    "to_tsvector('simple', coalesce(\"firstName\", '') || ' ' || coalesce(\"lastName\", '') || ' ' || "
+    "coalesce(email, '') || ' ' || coalesce(\"documentNumber\", ''))"
+)
+
+event.listen(
+    Tenant.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_tenants_search_tsv ON tenants "
+        f"USING gin ({TENANT_SEARCH_VECTOR_SQL})"
+    ).execute_if(dialect="postgresql")
+)
+
 class Lease(Base):
     __tablename__ = "leases"
+    __table_args__ = (
+        # Contratti in scadenza: range su endDate, colonne più lette incluse nell'indice (PostgreSQL 11+)
+        Index(
+            "ix_leases_endDate_covering",
+            "endDate",
+            postgresql_include=["tenantId", "apartmentId", "startDate"]
+        ),
+        # Contratti attivi di un appartamento (endDate > oggi), con tenantId letto dall'indice
+        Index(
+            "ix_leases_apartmentId_endDate",
+            "apartmentId",
+            "endDate",
+            postgresql_include=["tenantId"]
+        ),
+        # Contratti di un inquilino ordinati per startDate
+        Index("ix_leases_tenantId_startDate", "tenantId", "startDate"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey("users.id"), nullable=False)  # Multi-tenancy
@@ -255,7 +334,7 @@ class Lease(Base):
     specialClauses = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
     createdAt = Column(DateTime, default=datetime.utcnow)
-    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updatedAt = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=utcnow())
     deletedAt = Column(DateTime, nullable=True)  # Per soft delete
     hasPdf = Column(Boolean, default=False)
 
@@ -280,11 +359,16 @@ class Lease(Base):
     gasReading = relationship("UtilityReading", foreign_keys=[gasReadingId])
     electricityLaundryReading = relationship("UtilityReading", foreign_keys=[electricityLaundryReadingId])
     
-    @property
+    @hybrid_property
     def isActive(self):
         """Determina se il contratto è attivo. È attivo fino alle 23:59 del giorno precedente alla data di fine."""
         return date.today() < self.endDate if self.endDate else True
 
+    @isActive.expression
+    def isActive(cls):
+        # Stessa regola in SQL (data odierna valutata a ogni uso): filtrabile e sargable su endDate
+        return or_(cls.endDate.is_(None), cls.endDate > date.today())
+
     @property
     def status(self):
         """Restituisce lo stato del contratto come stringa ('active' o 'terminated')."""
@@ -314,6 +398,27 @@ class LeaseDocument(Base):
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Fatture di un inquilino / appartamento filtrate per anno e mese
+        Index("ix_invoices_tenantId_year_month", "tenantId", "year", "month"),
+        Index("ix_invoices_apartmentId_year_month", "apartmentId", "year", "month"),
+        # Verifica "fattura già emessa per contratto/mese" nella generazione mensile
+        Index("ix_invoices_leaseId_year_month", "leaseId", "year", "month"),
+        # KPI delle fatture per utente (periodo su issueDate): colonne sommate/contate incluse
+        # nell'indice per index-only scan (PostgreSQL 11+)
+        Index(
+            "ix_invoices_userId_issueDate_covering",
+            "userId",
+            "issueDate",
+            postgresql_include=["isPaid", "total", "dueDate"]
+        ),
+        # Fatture scadute: indice parziale sulle sole fatture non pagate
+        Index(
+            "ix_invoices_dueDate_unpaid",
+            "dueDate",
+            postgresql_where=text('NOT "isPaid"')
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey("users.id"), nullable=False)  # Multi-tenancy
@@ -389,6 +494,27 @@ class PaymentRecord(Base):
 
 class UtilityReading(Base):
     __tablename__ = "utility_readings"
+    __table_args__ = (
+        # Letture per appartamento in un intervallo di date / ultima lettura (scansione all'indietro)
+        Index("ix_utility_readings_apartmentId_readingDate", "apartmentId", "readingDate"),
+        # Ultima/precedente lettura per (appartamento, tipo, sottotipo): scansione all'indietro su readingDate
+        Index(
+            "ix_utility_readings_apartmentId_type_subtype_readingDate",
+            "apartmentId",
+            "type",
+            "subtype",
+            "readingDate"
+        ),
+        # Statistiche annuali (range su readingDate, raggruppate per tipo/appartamento):
+        # con le colonne sommate incluse bastano index-only scan (PostgreSQL 11+)
+        Index(
+            "ix_utility_readings_readingDate_type_apartmentId",
+            "readingDate",
+            "type",
+            "apartmentId",
+            postgresql_include=["subtype", "userId", "consumption", "totalCost"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey("users.id"), nullable=False)  # Multi-tenancy
@@ -423,7 +549,7 @@ class UtilityReading(Base):
 
     # Timestamp e soft delete
     createdAt = Column(DateTime, default=datetime.utcnow)
-    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updatedAt = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=utcnow())
     deletedAt = Column(DateTime, nullable=True)  # Per soft delete
 
     # Relazione con User (nuova per multi-tenancy)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Form, UploadFile, File, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import json
@@ -38,6 +39,17 @@ def get_apartments(
         minRooms, maxPrice, hasBalcony, hasParking, isFurnished, current_user.id
     )
 
+# GET lightweight apartment list
+@router.get("/summary/list", response_model=List[schemas.ApartmentSummary])
+def get_apartments_summary(
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    return service.get_apartments_summary(db, skip, limit, status, user_id=current_user.id)
+
 # GET apartment by ID
 @router.get("/{apartmentId}", response_model=schemas.Apartment)
 def get_apartment(apartmentId: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
@@ -74,14 +86,14 @@ async def create_apartment_with_images(
     apartment_data = json.loads(apartment)
     apartment_obj = schemas.ApartmentCreate(**apartment_data)
     
-    # Create the apartment first
-    new_apartment = service.create_apartment(db, apartment_obj, user_id=current_user.id)
+    # Create the apartment first (le chiamate DB sincrone non devono bloccare l'event loop)
+    new_apartment = await run_in_threadpool(service.create_apartment, db, apartment_obj, current_user.id)
     
     # Handle file uploads if any
     if files:
         image_urls = await service.save_apartment_images(new_apartment.id, files)
         # Update the apartment with image URLs
-        new_apartment = service.update_apartment_images(db, new_apartment.id, image_urls)
+        new_apartment = await run_in_threadpool(service.update_apartment_images, db, new_apartment.id, image_urls)
     
     return new_apartment
 
@@ -107,7 +119,7 @@ async def update_apartment_with_images(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    existing_apartment = service.get_apartment(db, apartmentId, current_user.id)
+    existing_apartment = await run_in_threadpool(service.get_apartment, db, apartmentId, current_user.id)
     if existing_apartment is None:
         raise HTTPException(status_code=404, detail="Apartment not found")
     
@@ -115,20 +127,20 @@ async def update_apartment_with_images(
     apartment_obj = schemas.ApartmentCreate(**apartment_data)
     
     # Update the apartment data
-    updated_apartment = service.update_apartment(db, apartmentId, apartment_obj)
+    updated_apartment = await run_in_threadpool(service.update_apartment, db, apartmentId, apartment_obj)
     
     # Handle file uploads if any
     if files:
         image_urls = await service.save_apartment_images(apartmentId, files)
         # Merge with existing images or replace them
-        updated_apartment = service.update_apartment_images(db, apartmentId, image_urls, append=True)
+        updated_apartment = await run_in_threadpool(service.update_apartment_images, db, apartmentId, image_urls, True)
     
     # Sincronizza automaticamente le immagini con il filesystem dopo l'aggiornamento
-    sync_result = service.sync_apartment_images_with_filesystem(db, apartmentId)
+    sync_result = await run_in_threadpool(service.sync_apartment_images_with_filesystem, db, apartmentId)
     if sync_result and sync_result["removed_orphaned_images"]:
         print(f"Sincronizzate immagini durante aggiornamento appartamento {apartmentId}: rimossi {len(sync_result['removed_orphaned_images'])} riferimenti orfani")
         # Ricarica l'appartamento dopo la sincronizzazione
-        updated_apartment = service.get_apartment(db, apartmentId, current_user.id)
+        updated_apartment = await run_in_threadpool(service.get_apartment, db, apartmentId, current_user.id)
     
     return updated_apartment
 
@@ -151,6 +163,8 @@ def delete_apartment(apartmentId: int, db: Session = Depends(get_db), current_us
         if os.path.exists(folder_path) and os.path.isdir(folder_path):
             # Delete the folder and all its contents
             shutil.rmtree(folder_path)
+            # La directory non esiste più: il prossimo upload (ID riutilizzato) deve ricrearla
+            service.forget_upload_dirs(f"static/apartments/{apartmentId}")
             print(f"Successfully deleted image folder for apartment {apartmentId}")
         else:
             print(f"No image folder found for apartment {apartmentId}")
@@ -244,6 +258,14 @@ def get_apartment_invoices(
         raise HTTPException(status_code=404, detail="Apartment not found")
     return service.get_apartment_invoices(db, apartmentId, isPaid, year, month, user_id=current_user.id)
 
+# GET apartment images
+@router.get("/{apartmentId}/images", response_model=List[str])
+def get_apartment_images(apartmentId: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    images = service.get_apartment_images(db, apartmentId, user_id=current_user.id)
+    if images is None:
+        raise HTTPException(status_code=404, detail="Apartment not found")
+    return images
+
 # POST upload apartment image
 @router.post("/{apartmentId}/images", response_model=dict)
 async def upload_apartment_image(
@@ -252,36 +274,70 @@ async def upload_apartment_image(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    apartment = service.get_apartment(db, apartmentId, user_id=current_user.id)
+    apartment = await run_in_threadpool(service.get_apartment, db, apartmentId, current_user.id)
     if apartment is None:
         raise HTTPException(status_code=404, detail="Apartment not found")
     
     image_url = await service.save_apartment_image(apartmentId, image)
-    service.add_apartment_image(db, apartmentId, image_url)
+    await run_in_threadpool(service.add_apartment_image, db, apartmentId, image_url)
     
     return {"imageUrl": image_url}
 
-# DELETE apartment image
-@router.delete("/{apartmentId}/images/{image_name}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_apartment_image(
+# POST upload multiple apartment images in one transaction
+@router.post("/{apartmentId}/images/batch", response_model=dict)
+async def upload_apartment_images_batch(
     apartmentId: int,
-    image_name: str,
+    images: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    apartment = service.get_apartment(db, apartmentId, user_id=current_user.id)
+    apartment = await run_in_threadpool(service.get_apartment, db, apartmentId, current_user.id)
+    if apartment is None:
+        raise HTTPException(status_code=404, detail="Apartment not found")
+    
+    image_urls = await service.save_apartment_images(apartmentId, images)
+    await run_in_threadpool(service.add_apartment_images_bulk, db, apartmentId, image_urls)
+    
+    return {"imageUrls": image_urls}
+
+# POST upload apartment image (raw body, streamed to disk)
+@router.post("/{apartmentId}/images/stream", response_model=dict)
+async def upload_apartment_image_stream(
+    apartmentId: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Carica un'immagine inviata come corpo grezzo della richiesta, senza passare dal file temporaneo multipart."""
+    apartment = await run_in_threadpool(service.get_apartment, db, apartmentId, current_user.id)
     if apartment is None:
         raise HTTPException(status_code=404, detail="Apartment not found")
+
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Il file deve essere un'immagine")
+
+    # Formato ed estensione vengono verificati sul contenuto dal service
+    image_url = await service.save_apartment_image_stream(apartmentId, request.stream())
+    await run_in_threadpool(service.add_apartment_image, db, apartmentId, image_url)
+
+    return {"imageUrl": image_url}
+
+# DELETE apartment image
+@router.delete("/{apartmentId}/images/{image_name}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_apartment_image(
     apartmentId: int,
     image_name: str,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
 ):
-    apartment = service.get_apartment(db, apartmentId)
+    apartment = service.get_apartment(db, apartmentId, user_id=current_user.id)
     if apartment is None:
         raise HTTPException(status_code=404, detail="Apartment not found")
     
-    success = service.delete_apartment_image(db, apartmentId, image_name)
+    # Il file viene eliminato in background, dopo la risposta
+    success = service.delete_apartment_image(db, apartmentId, image_name, background_tasks)
     if not success:
         raise HTTPException(status_code=404, detail="Image not found")
     
@@ -311,37 +367,18 @@ def sync_apartment_images(apartmentId: int, db: Session = Depends(get_db)):
 @router.post("/sync-all-images", response_model=dict)
 def sync_all_apartments_images(db: Session = Depends(get_db)):
     """Sincronizza le immagini di tutti gli appartamenti nel database con quelle fisicamente presenti nel filesystem."""
-    apartments = service.get_apartments(db, skip=0, limit=1000)  # Prendi tutti gli appartamenti
-    
-    total_orphaned_removed = 0
-    processed_apartments = 0
-    sync_results = []
-    
-    for apartment in apartments:
-        sync_result = service.sync_apartment_images_with_filesystem(db, apartment.id)
-        if sync_result:
-            orphaned_count = len(sync_result["removed_orphaned_images"])
-            if orphaned_count > 0:
-                sync_results.append({
-                    "apartment_id": apartment.id,
-                    "apartment_name": apartment.name,
-                    "orphaned_images_removed": sync_result["removed_orphaned_images"],
-                    "removed_count": orphaned_count
-                })
-                total_orphaned_removed += orphaned_count
-            processed_apartments += 1
+    # Una sola scansione del filesystem e un solo commit per tutti gli appartamenti
+    sync_result = service.sync_all_apartment_images(db, limit=1000)
     
     return {
         "message": "Sincronizzazione completata per tutti gli appartamenti",
-        "processed_apartments": processed_apartments,
-        "total_orphaned_images_removed": total_orphaned_removed,
-        "detailed_results": sync_results
+        **sync_result
     }
 
 # GET available apartments
 @router.get("/available/list", response_model=List[schemas.Apartment])
 def get_available_apartments(db: Session = Depends(get_db)):
-    return service.get_apartments(db, status="available")
+    return service.get_available_apartments(db)
 
 # GET search apartments
 @router.get("/search/", response_model=List[schemas.Apartment])
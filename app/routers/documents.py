@@ -1,8 +1,10 @@
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from app.services.r2_manager import R2Manager
 from datetime import datetime
 from app.routers.auth import get_current_active_user
+from app.config import settings
 import logging
 
 router = APIRouter(
@@ -53,8 +55,11 @@ async def upload_document(
             # o lasciamo la logica esistente
             pass
 
-        # Leggi il contenuto del file
-        content = await file.read()
+        # Verifica il limite configurato; il contenuto non viene letto in memoria:
+        # il file temporaneo dell'upload viene passato così com'è a R2 (streaming a blocchi)
+        if file.size is not None and file.size > settings.max_upload_size:
+            raise HTTPException(status_code=413, detail="File troppo grande")
+        await file.seek(0)
         
         # Crea un nome file univoco e parlante
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -72,8 +77,8 @@ async def upload_document(
         if 'documento' in tipo_file:
             r2_type = 'documento'
             
-        # Upload su Cloudflare R2
-        success = r2_manager.upload_file(content, file_name, r2_type)
+        # Upload su Cloudflare R2 (boto3 è bloccante: eseguito nel threadpool)
+        success = await run_in_threadpool(r2_manager.upload_file, file.file, file_name, r2_type)
         
         if success:
             # --- LOGICA DATABASE ---
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Form, UploadFile, File, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import json
@@ -59,11 +60,21 @@ def create_lease(
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
     
-    # Crea il contratto
-    db_lease = service.create_lease(db, lease, user_id=current_user.id)
+    # Occupa l'appartamento con un UPDATE condizionale: tra richieste concorrenti
+    # solo una lo trova ancora "available". Nessun commit qui: occupazione e contratto
+    # vengono confermati insieme dal commit di create_lease
+    if service.update_apartment_status(
+        db, lease.apartmentId, "occupied", expected_status="available", commit=False
+    ) is None:
+        raise HTTPException(status_code=400, detail="Apartment is not available")
     
-    # Aggiorna lo stato dell'appartamento a "occupied"
-    service.update_apartment_status(db, lease.apartmentId, "occupied")
+    # Crea il contratto; se fallisce il rollback annulla anche l'occupazione
+    try:
+        db_lease = service.create_lease(db, lease, user_id=current_user.id)
+    except Exception:
+        db.rollback()
+        raise
+    service.invalidate_apartment_cache()
     
     # Genera automaticamente la fattura di ingresso (caparra)
     try:
@@ -96,25 +107,38 @@ def update_lease(
         if new_apartment.status != "available":
             raise HTTPException(status_code=400, detail="New apartment is not available")
         
-        # Aggiorna lo stato del vecchio appartamento a "available"
-        service.update_apartment_status(db, existing_lease.apartmentId, "available")
+        # Occupa il nuovo appartamento solo se è ancora "available" (UPDATE condizionale)
+        if service.update_apartment_status(
+            db, lease.apartmentId, "occupied", expected_status="available", commit=False
+        ) is None:
+            raise HTTPException(status_code=400, detail="New apartment is not available")
         
-        # Aggiorna lo stato del nuovo appartamento a "occupied"
-        service.update_apartment_status(db, lease.apartmentId, "occupied")
+        # Aggiorna lo stato del vecchio appartamento a "available"
+        service.update_apartment_status(db, existing_lease.apartmentId, "available", commit=False)
     
-    return service.update_lease(db, leaseId, lease)
+    # Un solo commit per cambio appartamenti e contratto
+    updated_lease = service.update_lease(db, leaseId, lease)
+    service.invalidate_apartment_cache()
+    return updated_lease
 
 # DELETE lease
 @router.delete("/{leaseId}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_lease(leaseId: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def delete_lease(
+    leaseId: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
     existing_lease = service.get_lease(db, leaseId, current_user.id)
     if existing_lease is None:
         raise HTTPException(status_code=404, detail="Lease not found")
     
-    # Libera l'appartamento
-    service.update_apartment_status(db, existing_lease.apartmentId, "available")
+    # Libera l'appartamento (confermato insieme all'eliminazione del contratto)
+    service.update_apartment_status(db, existing_lease.apartmentId, "available", commit=False)
     
-    service.delete_lease(db, leaseId)
+    # Commit di stato appartamento ed eliminazione; file R2 e locali rimossi dopo la risposta
+    service.delete_lease(db, leaseId, background_tasks)
+    service.invalidate_apartment_cache()
     return {"detail": "Lease deleted successfully"}
 
 # PATCH terminate lease
@@ -141,14 +165,14 @@ def terminate_lease(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format, use YYYY-MM-DD")
     
-    # Libera l'appartamento
-    service.update_apartment_status(db, existing_lease.apartmentId, "available")
+    # Libera l'appartamento (confermato insieme alla chiusura del contratto)
+    service.update_apartment_status(db, existing_lease.apartmentId, "available", commit=False)
     
-    # Aggiorna il contratto
+    # Aggiorna il contratto; un solo commit per appartamento e contratto
     existing_lease.endDate = endDate
     existing_lease.notes = termination_data.get("notes", existing_lease.notes)
-    existing_lease.updatedAt = datetime.utcnow()
     db.commit()
+    service.invalidate_apartment_cache()
     db.refresh(existing_lease)
     
     return existing_lease
@@ -170,7 +194,7 @@ async def add_lease_document(
     document: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    lease = service.get_lease(db, leaseId)
+    lease = await run_in_threadpool(service.get_lease, db, leaseId)
     if lease is None:
         raise HTTPException(status_code=404, detail="Lease not found")
     
@@ -185,7 +209,7 @@ async def add_lease_document(
         "uploadDate": datetime.utcnow().date()
     }
     
-    return service.create_lease_document(db, schemas.LeaseDocumentCreate(**document_data))
+    return await run_in_threadpool(service.create_lease_document, db, schemas.LeaseDocumentCreate(**document_data))
 
 # GET lease documents
 @router.get("/{leaseId}/documents", response_model=List[schemas.LeaseDocument])
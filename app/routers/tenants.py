@@ -1,6 +1,6 @@
 import os
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File, Query, status, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Form, UploadFile, File, Query, status, Body
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -8,6 +8,7 @@ import json
 import time
 from datetime import datetime
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 
 from app.database import get_db
 from app.models import models
@@ -31,6 +32,16 @@ def get_tenants(
 ):
     return service.get_tenants(db, skip=skip, limit=limit, user_id=current_user.id)
 
+# GET lightweight tenant list
+@router.get("/summary/list", response_model=List[schemas.TenantSummary])
+def get_tenants_summary(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    return service.get_tenants_summary(db, skip=skip, limit=limit, user_id=current_user.id)
+
 # GET tenant by ID
 @router.get("/{tenantId}", response_model=schemas.Tenant)
 def get_tenant(tenantId: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
@@ -167,7 +178,7 @@ async def update_tenant_with_images(
     current_user: models.User = Depends(get_current_active_user)
 ):
     try:
-        existing_tenant = service.get_tenant(db, tenantId, user_id=current_user.id)
+        existing_tenant = await run_in_threadpool(service.get_tenant, db, tenantId, current_user.id)
         if existing_tenant is None:
             raise HTTPException(status_code=404, detail="Tenant non trovato")
         
@@ -182,7 +193,7 @@ async def update_tenant_with_images(
         
         # Aggiorna i dati del tenant
         tenant_obj = schemas.TenantCreate(**tenant_data)
-        updated_tenant = service.update_tenant(db, tenantId, tenant_obj)
+        updated_tenant = await run_in_threadpool(service.update_tenant, db, tenantId, tenant_obj)
         
         # Gestisci le immagini in parallelo se fornite
         front_image_task = None
@@ -190,18 +201,18 @@ async def update_tenant_with_images(
         
         if documentFrontImage:
             doc_url = await service.save_tenant_document(tenantId, documentFrontImage, "front")
-            updated_tenant = service.update_tenant_document(db, tenantId, doc_url, "front")
+            updated_tenant = await run_in_threadpool(service.update_tenant_document, db, tenantId, doc_url, "front")
         
         if documentBackImage:
             doc_url = await service.save_tenant_document(tenantId, documentBackImage, "back")
-            updated_tenant = service.update_tenant_document(db, tenantId, doc_url, "back")
+            updated_tenant = await run_in_threadpool(service.update_tenant_document, db, tenantId, doc_url, "back")
         
         # Sincronizza automaticamente i documenti con il filesystem dopo l'aggiornamento
-        sync_result = service.sync_tenant_documents_with_filesystem(db, tenantId)
+        sync_result = await run_in_threadpool(service.sync_tenant_documents_with_filesystem, db, tenantId)
         if sync_result and sync_result["removed_orphaned_documents"]:
             print(f"Sincronizzati documenti durante aggiornamento tenant {tenantId}: rimossi {len(sync_result['removed_orphaned_documents'])} riferimenti orfani")
             # Ricarica il tenant dopo la sincronizzazione
-            updated_tenant = service.get_tenant(db, tenantId, user_id=current_user.id)
+            updated_tenant = await run_in_threadpool(service.get_tenant, db, tenantId, current_user.id)
         
         return updated_tenant
         
@@ -272,7 +283,7 @@ async def download_tenant_document(
     doc_type: str,
     db: Session = Depends(get_db)
 ):
-    tenant = service.get_tenant(db, tenantId)
+    tenant = await run_in_threadpool(service.get_tenant, db, tenantId)
     if tenant is None:
         raise HTTPException(status_code=404, detail="Tenant non trovato")
     
@@ -290,7 +301,7 @@ async def download_tenant_document(
         raise HTTPException(status_code=404, detail="Documento non trovato")
     
     file_path = f"static{file_url}"
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
+    if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File non trovato")
     
     # Restituisci il file con header anti-cache aggressivi
@@ -379,11 +390,12 @@ def get_tenant_payment_history(tenantId: int, db: Session = Depends(get_db), cur
 async def upload_tenant_document(
     tenantId: int,
     doc_type: str,
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    tenant = service.get_tenant(db, tenantId, user_id=current_user.id)
+    tenant = await run_in_threadpool(service.get_tenant, db, tenantId, current_user.id)
     if tenant is None:
         raise HTTPException(status_code=404, detail="Tenant non trovato")
     
@@ -394,7 +406,9 @@ async def upload_tenant_document(
     doc_url = await service.save_tenant_document(tenantId, image, doc_type)
     
     # Aggiorna il database
-    updated_tenant = service.update_tenant_document(db, tenantId, doc_url, doc_type)
+    updated_tenant = await run_in_threadpool(
+        service.update_tenant_document, db, tenantId, doc_url, doc_type, background_tasks
+    )
     
     # Verifica che l'URL sia stato effettivamente aggiornato
     verified_url = ""
@@ -426,7 +440,7 @@ async def delete_tenant_document(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    tenant = service.get_tenant(db, tenantId, user_id=current_user.id)
+    tenant = await run_in_threadpool(service.get_tenant, db, tenantId, current_user.id)
     if tenant is None:
         raise HTTPException(status_code=404, detail="Tenant not found")
     return {
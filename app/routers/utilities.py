@@ -188,9 +188,10 @@ def mark_utility_reading_paid(
     # Aggiorna la lettura
     existing_reading.isPaid = True
     existing_reading.paidDate = datetime.utcnow().date()
-    existing_reading.updatedAt = datetime.utcnow()
     db.commit()
     db.refresh(existing_reading)
+    # La lettura è inclusa nel payload degli appartamenti in cache
+    service.invalidate_apartment_cache()
     
     return existing_reading
 
@@ -326,44 +327,76 @@ def get_last_reading_info(
     }
 
 # BULK operations for multiple readings
-@router.post("/bulk", response_model=List[schemas.UtilityReading])
-def create_bulk_utility_readings(
+def _prepare_bulk_readings(
+    db: Session,
     readings: List[schemas.UtilityReadingCreate],
-    db: Session = Depends(get_db)
+    user_id: Optional[int] = None
 ):
-    """Create multiple utility readings at once"""
-    created_readings = []
+    """Valida un batch di letture e ne calcola lettura precedente, consumo e costo."""
+    checked_apartments = set()
+    # Ultima lettura (data, valore) per (appartamento, tipo, sottotipo), aggiornata con quelle del batch
+    last_by_key = {}
     
     for reading_data in readings:
         # Verify apartment exists
-        apartment = service.get_apartment(db, reading_data.apartmentId)
-        if not apartment:
-            raise HTTPException(status_code=404, detail=f"Apartment {reading_data.apartmentId} not found")
+        if reading_data.apartmentId not in checked_apartments:
+            apartment = service.get_apartment(db, reading_data.apartmentId, user_id)
+            if not apartment:
+                raise HTTPException(status_code=404, detail=f"Apartment {reading_data.apartmentId} not found")
+            checked_apartments.add(reading_data.apartmentId)
         
         # Standardizza il sottotipo per le utenze principali
         if not reading_data.subtype:
             reading_data.subtype = "main"
         
         # Get last reading for calculation
-        last_reading = service.get_last_utility_reading(db, reading_data.apartmentId, reading_data.type, reading_data.subtype)
+        key = (reading_data.apartmentId, reading_data.type, reading_data.subtype)
+        if key not in last_by_key:
+            last_reading = service.get_last_utility_reading(db, *key)
+            last_by_key[key] = (last_reading.readingDate, last_reading.currentReading) if last_reading else None
+        last = last_by_key[key]
         
-        if last_reading:
-            if reading_data.currentReading < last_reading.currentReading:
+        if last:
+            if reading_data.currentReading < last[1]:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"Current reading for apartment {reading_data.apartmentId} must be greater than the last reading ({last_reading.currentReading})"
+                    detail=f"Current reading for apartment {reading_data.apartmentId} must be greater than the last reading ({last[1]})"
                 )
-            reading_data.previousReading = last_reading.currentReading
+            reading_data.previousReading = last[1]
         
         # Calculate consumption and cost
         reading_data.consumption = reading_data.currentReading - reading_data.previousReading
         reading_data.totalCost = reading_data.consumption * reading_data.unitCost
         
-        # Create the reading
-        created_reading = service.create_utility_reading(db, reading_data)
-        created_readings.append(created_reading)
+        # La lettura del batch diventa l'ultima se è la più recente, come se fosse già salvata
+        # (get_last_utility_reading considera solo isSpecialReading == False)
+        if reading_data.isSpecialReading is False and (last is None or reading_data.readingDate >= last[0]):
+            last_by_key[key] = (reading_data.readingDate, reading_data.currentReading)
+
+@router.post("/bulk", response_model=List[schemas.UtilityReading])
+def create_bulk_utility_readings(
+    readings: List[schemas.UtilityReadingCreate],
+    db: Session = Depends(get_db)
+):
+    """Create multiple utility readings at once"""
+    _prepare_bulk_readings(db, readings)
     
-    return created_readings
+    # Create all the readings in one round-trip and one transaction
+    return service.bulk_create_utility_readings(db, readings)
+
+# POST import utility readings (e.g. meter exports)
+@router.post("/import", status_code=status.HTTP_201_CREATED)
+def import_utility_readings(
+    readings: List[schemas.UtilityReadingCreate],
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Import a large batch of utility readings; returns only the number of rows written.
+
+    Batches above service.COPY_THRESHOLD are written with COPY on PostgreSQL."""
+    _prepare_bulk_readings(db, readings, user_id=current_user.id)
+    imported = service.bulk_copy_utility_readings(db, readings, user_id=current_user.id)
+    return {"imported": imported}
 
 # GET laundry electricity cost for specific month
 @router.get("/laundry-cost/month/{apartmentId}/{year}/{month}")
@@ -94,6 +94,16 @@ class Apartment(ApartmentBase):
     utilityReadings: Optional[List[UtilityReading]] = []
     maintenanceRecords: Optional[List[MaintenanceRecord]] = []
 
+# Versione ridotta per le viste elenco (nessuna relazione né colonne pesanti)
+class ApartmentSummary(CamelCaseModel):
+    id: int
+    name: str
+    floor: int
+    rooms: int
+    squareMeters: float
+    monthlyRent: float
+    status: str
+
 # ------------------ SCHEMA TENANT ------------------
 class CommunicationPreferences(CamelCaseModel):
     email: bool = True
@@ -130,6 +140,14 @@ class Tenant(TenantBase):
     createdAt: datetime
     updatedAt: datetime
 
+# Versione ridotta per le viste elenco
+class TenantSummary(CamelCaseModel):
+    id: int
+    firstName: str
+    lastName: str
+    email: Optional[str] = None
+    phone: str
+
 # ------------------ SCHEMA TENANT DOCUMENT ------------------
 
 class DocumentResponse(CamelCaseModel):
@@ -21,6 +21,7 @@ class R2Manager:
     def upload_file(self, file_content, file_name, file_type):
         """
         Carica il file nel bucket corrispondente.
+        file_content: bytes oppure file-like aperto in lettura (inviato a blocchi)
         file_type: 'prospetto', 'contratto' o 'documento'
         """
         # Mappatura dei bucket dalle variabili d'ambiente
@@ -1,19 +1,349 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func
-from fastapi import UploadFile, HTTPException
+from sqlalchemy.orm import Session, load_only, selectinload
+from sqlalchemy import or_, and_, false, func, insert, update, delete, select, case, bindparam, cast, literal, literal_column, lambda_stmt
+from sqlalchemy.dialects.postgresql import JSONB
+from fastapi import UploadFile, HTTPException, BackgroundTasks
 import os
 import shutil
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, timezone, date
 import uuid
-from typing import List, Optional, Dict, Any
+from collections import defaultdict
+from typing import List, Optional, Dict, Any, AsyncIterator
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import re
+import threading
 import time
-import imghdr  # Per la validazione del tipo di immagine
 import aiofiles  # Per operazioni asincrone sui file
 
 from app.models import models
 from app.schemas import schemas
 from app.services.billing_defaults_service import get_defaults
+from app.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Nomi dei mesi in italiano (indice 0 = Gennaio)
+_MONTH_NAMES_IT = (
+    "Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno",
+    "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre"
+)
+
+
+# ----- File Helpers -----
+
+# Directory di upload già create: evita un os.makedirs (stat su ogni componente) per ogni file
+_created_dirs: set = set()
+_created_dirs_lock = threading.Lock()
+
+def _ensure_dir(path: str, mode: int = 0o777):
+    """Crea la directory se necessario, ricordando quelle già verificate."""
+    if path in _created_dirs:
+        return
+    with _created_dirs_lock:
+        if path not in _created_dirs:
+            os.makedirs(path, exist_ok=True, mode=mode)
+            _created_dirs.add(path)
+
+# Sottodirectory per entità in cui vengono salvati gli upload
+_UPLOAD_DIR_LAYOUT = (
+    ("static/apartments", ""),
+    ("static/tenants", "/documents"),
+    ("static/leases", "/documents"),
+)
+
+def warm_upload_dirs():
+    """Registra all'avvio le directory di upload già presenti su disco, così anche il
+    primo upload per un'entità esistente non passa da os.makedirs."""
+    found = []
+    for root, suffix in _UPLOAD_DIR_LAYOUT:
+        try:
+            entries = os.scandir(root)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir():
+                    path = f"{root}/{entry.name}{suffix}"
+                    if not suffix or os.path.isdir(path):
+                        found.append(path)
+    with _created_dirs_lock:
+        _created_dirs.update(found)
+    return len(found)
+
+def _remove_file_quietly(path: str):
+    """Elimina un file ignorando il caso in cui non esista più."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Errore eliminazione file %s: %s", path, e)
+
+def _discard_file(path: str, background_tasks: Optional[BackgroundTasks] = None):
+    """Rimuove un file, dopo l'invio della risposta se è disponibile background_tasks."""
+    if background_tasks is not None:
+        background_tasks.add_task(_remove_file_quietly, path)
+    else:
+        _remove_file_quietly(path)
+
+def _static_path(url: str) -> str:
+    """Percorso su disco di un URL statico, senza eventuale query string di cache-busting."""
+    return f"static{url.partition('?')[0]}"
+
+def forget_upload_dirs(prefix: str):
+    """Dimentica le directory sotto prefix (da chiamare dopo un rmtree)."""
+    with _created_dirs_lock:
+        for path in [p for p in _created_dirs if p == prefix or p.startswith(prefix + "/")]:
+            _created_dirs.discard(path)
+
+# Dimensione dei blocchi per le copie in user space (fallback quando sendfile non è usabile)
+_UPLOAD_CHUNK_SIZE = 1 << 16
+
+def _check_upload_size(file: UploadFile):
+    """Rifiuta con 413 gli upload oltre settings.max_upload_size, prima di scriverli su disco."""
+    size = file.size
+    if size is None:
+        # Upload costruiti a mano (senza size): misura il file spostandosi in fondo
+        position = file.file.tell()
+        size = file.file.seek(0, os.SEEK_END)
+        file.file.seek(position)
+    if size > settings.max_upload_size:
+        raise HTTPException(status_code=413, detail="File troppo grande")
+
+def _copy_upload_to_path(file: UploadFile, file_path: str):
+    """Copia un UploadFile su disco usando os.sendfile (copia kernel-side) quando possibile."""
+    # SpooledTemporaryFile tiene i file piccoli in un BytesIO: non chiamare fileno()
+    # su di esso, altrimenti verrebbe forzato il rollover su disco.
+    source = getattr(file.file, "_file", file.file)
+    try:
+        source.flush()
+        in_fd = source.fileno()
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        in_fd = None
+
+    with open(file_path, "wb") as buffer:
+        if in_fd is None or not hasattr(os, "sendfile"):
+            shutil.copyfileobj(file.file, buffer, _UPLOAD_CHUNK_SIZE)
+            return
+
+        start = offset = source.tell()
+        remaining = os.fstat(in_fd).st_size - offset
+        out_fd = buffer.fileno()
+        try:
+            while remaining > 0:
+                sent = os.sendfile(out_fd, in_fd, offset, remaining)
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+        except OSError:
+            # Alcune piattaforme (es. macOS) supportano sendfile solo verso socket
+            buffer.seek(0)
+            buffer.truncate()
+            source.seek(start)
+            shutil.copyfileobj(source, buffer, _UPLOAD_CHUNK_SIZE)
+
+
+# ----- Cache Helpers -----
+
+class _TTLCache:
+    """Cache in memoria (per processo) con scadenza e dimensione massima, thread-safe."""
+
+    def __init__(self, ttl: int, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Restituisce il valore in cache oppure None se assente o scaduto."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                # Elimina la voce inserita per prima (dict mantiene l'ordine di inserimento)
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+# Statistiche annuali sulle utenze: aggregazioni su un anno intero, richieste a ogni refresh della dashboard
+_stats_cache = _TTLCache(ttl=settings.stats_cache_expire_seconds, maxsize=64)
+
+# Elenco degli appartamenti disponibili (con letture e manutenzioni annidate), richiesto a ogni pagina
+_apartments_cache = _TTLCache(ttl=settings.cache_expire_seconds, maxsize=8)
+
+# KPI delle fatture (somme e conteggi sul periodo), richiesti a ogni apertura della dashboard
+_invoice_stats_cache = _TTLCache(ttl=settings.cache_expire_seconds, maxsize=16)
+
+def _cached(cache: _TTLCache, key, compute):
+    """Restituisce il valore in cache o lo calcola (se la cache è abilitata)."""
+    if not settings.cache_enabled:
+        return compute()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value)
+    return value
+
+def _cached_stats(key, compute):
+    """Restituisce la statistica in cache o la calcola (se la cache è abilitata)."""
+    return _cached(_stats_cache, key, compute)
+
+def invalidate_apartment_cache():
+    """Svuota la cache degli appartamenti: da chiamare dopo ogni scrittura su un appartamento."""
+    _apartments_cache.clear()
+
+def invalidate_invoice_stats():
+    """Svuota la cache dei KPI delle fatture: da chiamare dopo ogni scrittura su fatture o pagamenti."""
+    _invoice_stats_cache.clear()
+
+def invalidate_utility_stats():
+    """Svuota la cache delle statistiche: da chiamare dopo ogni scrittura di letture."""
+    _stats_cache.clear()
+    # Le letture compaiono anche nel payload degli appartamenti in cache
+    invalidate_apartment_cache()
+
+
+# ----- Query Helpers -----
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _utc_today() -> date:
+    """Data odierna in UTC (datetime timezone-aware), la stessa per tutti gli endpoint."""
+    return datetime.now(timezone.utc).date()
+
+def _commit_without_expire(db: Session):
+    """Commit senza scadere gli oggetti della sessione: i valori appena letti con
+    RETURNING restano validi e la serializzazione della risposta non rifà una SELECT."""
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+def _get(db: Session, model_class, entity_id: int, user_id: Optional[int] = None):
+    """Lookup per chiave primaria tramite identity map (Session.get), poi filtri
+    soft delete e multi-tenancy applicati sull'oggetto invece che in SQL."""
+    entity = db.get(model_class, entity_id)
+    if entity is None:
+        return None
+    if getattr(entity, "deletedAt", None) is not None:
+        return None
+    if user_id is not None and entity.userId != user_id:
+        return None
+    return entity
 
+def _images_as_jsonb():
+    """apartments.images (JSON) come jsonb, con lista vuota se NULL."""
+    return func.coalesce(cast(models.Apartment.images, JSONB), cast(literal("[]"), JSONB))
+
+def _lease_active_filter(isActive: bool):
+    """Filtro SQL per Lease.isActive == isActive."""
+    return models.Lease.isActive if isActive else ~models.Lease.isActive
+
+def _lease_status_filter(status: str):
+    """Filtro SQL per Lease.status == status ('active' / 'terminated'; altri valori: nessuna riga)."""
+    if status == "active":
+        return _lease_active_filter(True)
+    if status == "terminated":
+        return _lease_active_filter(False)
+    return false()
+
+def _reading_date_in(year: int, month: Optional[int] = None):
+    """Filtro half-open su UtilityReading.readingDate per un anno (o un mese dell'anno).
+    A differenza di EXTRACT(year/month ...) è sargable: usa l'indice (apartmentId, readingDate)."""
+    # Valori fuori range (query param non validati) non producono righe, come con EXTRACT
+    if not 1 <= year < 9999 or (month is not None and not 1 <= month <= 12):
+        return false()
+    if month is None:
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    else:
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return and_(models.UtilityReading.readingDate >= start, models.UtilityReading.readingDate < end)
+
+def _equal_filters(model, **values) -> list:
+    """Condizioni `colonna == valore` per i soli filtri valorizzati (None = filtro assente)."""
+    return [getattr(model, column) == value for column, value in values.items() if value is not None]
+
+def _reading_period_filters(year: Optional[int], month: Optional[int]) -> list:
+    """Filtri su readingDate per anno/mese opzionali (range sargable quando c'è l'anno)."""
+    if year is not None:
+        return [_reading_date_in(year, month)]
+    if month is not None:
+        return [func.extract('month', models.UtilityReading.readingDate) == month]
+    return []
+
+def _ranked_by_similarity(stmt, *columns):
+    """Variante Postgres di uno statement di ricerca, ordinata per similarità trigram
+    (pg_trgm) tra il termine cercato (bindparam "term") e la colonna più vicina."""
+    return stmt.order_by(
+        func.greatest(*(func.similarity(column, bindparam("term")) for column in columns)).desc()
+    )
+
+_MIN_SEARCH_LENGTH = 2
+
+def _run_search(db: Session, plain_stmt, ranked_stmt, query: str, params: Optional[dict] = None):
+    """Esegue la ricerca ILIKE (servita dagli indici GIN trigram); su Postgres ordina per rilevanza."""
+    # Termini vuoti o di un solo carattere ('%%', '%a%') selezionerebbero quasi tutta la tabella
+    query = (query or "").strip()
+    if len(query) < _MIN_SEARCH_LENGTH:
+        return []
+    params = dict(params or {}, q=f"%{query}%")
+    if _is_postgres(db):
+        params["term"] = query
+        return db.scalars(ranked_stmt, params).all()
+    return db.scalars(plain_stmt, params).all()
+
+# Colonne serializzate dagli endpoint in sola lettura (schemas.Tenant / schemas.PaymentRecord)
+_TENANT_READ_COLUMNS = (
+    models.Tenant.id,
+    models.Tenant.firstName,
+    models.Tenant.lastName,
+    models.Tenant.email,
+    models.Tenant.phone,
+    models.Tenant.documentType,
+    models.Tenant.documentNumber,
+    models.Tenant.documentExpiryDate,
+    models.Tenant.documentFrontImage,
+    models.Tenant.documentBackImage,
+    models.Tenant.address,
+    models.Tenant.communicationPreferences,
+    models.Tenant.notes,
+    models.Tenant.createdAt,
+    models.Tenant.updatedAt,
+)
+
+_PAYMENT_RECORD_READ_COLUMNS = (
+    models.PaymentRecord.id,
+    models.PaymentRecord.invoiceId,
+    models.PaymentRecord.amount,
+    models.PaymentRecord.paymentDate,
+    models.PaymentRecord.paymentMethod,
+    models.PaymentRecord.reference,
+    models.PaymentRecord.status,
+    models.PaymentRecord.notes,
+    models.PaymentRecord.createdAt,
+    models.PaymentRecord.updatedAt,
+)
 
 
 # ----- Apartment Services -----
@@ -31,195 +361,335 @@ def get_apartments(
     isFurnished: Optional[bool] = None,
     user_id: Optional[int] = None
 ):
-    query = db.query(models.Apartment)
-    # Soft delete filter
-    if hasattr(models.Apartment, "deletedAt"):
-        query = query.filter(models.Apartment.deletedAt.is_(None))
-    # Multi-tenancy filter
-    if user_id is not None:
-        query = query.filter(models.Apartment.userId == user_id)
-    
-    # Filter directly by status
-    if status:
-        query = query.filter(models.Apartment.status == status)
-    if floor is not None:
-        query = query.filter(models.Apartment.floor == floor)
+    # Soft delete, multi-tenancy e filtri opzionali in un'unica lista di condizioni
+    conditions = [
+        models.Apartment.deletedAt.is_(None),
+        *_equal_filters(
+            models.Apartment,
+            userId=user_id,
+            status=status or None,
+            floor=floor,
+            hasBalcony=hasBalcony,
+            hasParking=hasParking,
+            isFurnished=isFurnished,
+        ),
+    ]
     if minRooms is not None:
-        query = query.filter(models.Apartment.rooms >= minRooms)
+        conditions.append(models.Apartment.rooms >= minRooms)
     if maxPrice is not None:
-        query = query.filter(models.Apartment.monthlyRent <= maxPrice)
-    if hasBalcony is not None:
-        query = query.filter(models.Apartment.hasBalcony == hasBalcony)
-    if hasParking is not None:
-        query = query.filter(models.Apartment.hasParking == hasParking)
-    if isFurnished is not None:
-        query = query.filter(models.Apartment.isFurnished == isFurnished)
+        conditions.append(models.Apartment.monthlyRent <= maxPrice)
     
-    return query.offset(skip).limit(limit).all()
+    # Le relazioni serializzate in lista vengono caricate con una query IN batch
+    stmt = select(models.Apartment).options(
+        selectinload(models.Apartment.utilityReadings),
+        selectinload(models.Apartment.maintenanceRecords)
+    ).where(*conditions)
+    return db.scalars(stmt.offset(skip).limit(limit)).all()
 
-def get_apartment(db: Session, apartmentId: int, user_id: Optional[int] = None):
-    query = db.query(models.Apartment).filter(models.Apartment.id == apartmentId)
+def get_apartments_summary(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    user_id: Optional[int] = None
+):
+    """Elenco leggero degli appartamenti: carica solo le colonne mostrate in lista."""
+    conditions = [
+        models.Apartment.deletedAt.is_(None),
+        *_equal_filters(models.Apartment, userId=user_id, status=status or None),
+    ]
+    stmt = select(models.Apartment).options(load_only(
+        models.Apartment.id,
+        models.Apartment.name,
+        models.Apartment.floor,
+        models.Apartment.rooms,
+        models.Apartment.squareMeters,
+        models.Apartment.monthlyRent,
+        models.Apartment.status
+    )).where(*conditions)
+    return db.scalars(stmt.order_by(models.Apartment.id).offset(skip).limit(limit)).all()
+
+def get_apartment_images(db: Session, apartmentId: int, user_id: Optional[int] = None):
+    """Restituisce solo la lista immagini di un appartamento (None se non trovato)."""
+    query = db.query(models.Apartment.images).filter(models.Apartment.id == apartmentId)
     if hasattr(models.Apartment, "deletedAt"):
         query = query.filter(models.Apartment.deletedAt.is_(None))
     if user_id is not None:
         query = query.filter(models.Apartment.userId == user_id)
-    return query.first()
+    row = query.first()
+    if row is None:
+        return None
+    return row.images or []
+
+def get_apartment(db: Session, apartmentId: int, user_id: Optional[int] = None):
+    return _get(db, models.Apartment, apartmentId, user_id)
 
 def create_apartment(db: Session, apartment: schemas.ApartmentCreate, user_id: Optional[int] = None):
     data = apartment.dict()
     if user_id is not None:
         data["userId"] = user_id
-    db_apartment = models.Apartment(**data)
-    db.add(db_apartment)
-    db.commit()
-    db.refresh(db_apartment)
+    # INSERT ... RETURNING: la riga completa (id, default) senza refresh successivo
+    db_apartment = db.execute(
+        insert(models.Apartment).values(**data).returning(models.Apartment)
+    ).scalar_one()
+    _commit_without_expire(db)
+    invalidate_apartment_cache()
     return db_apartment
 
 def update_apartment(db: Session, apartmentId: int, apartment: schemas.ApartmentCreate):
-    db_apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
-    if db_apartment:
-        for key, value in apartment.dict().items():
-            setattr(db_apartment, key, value)
-        setattr(db_apartment, "updatedAt", datetime.utcnow())
-        db.commit()
-        db.refresh(db_apartment)
+    # Singolo UPDATE ... RETURNING invece di SELECT + setattr + refresh
+    db_apartment = db.execute(
+        update(models.Apartment)
+        .where(models.Apartment.id == apartmentId)
+        .values(**apartment.dict(), updatedAt=models.utcnow())
+        .returning(models.Apartment)
+    ).scalar_one_or_none()
+    _commit_without_expire(db)
+    # Le statistiche annuali riportano il nome dell'appartamento
+    invalidate_utility_stats()
     return db_apartment
 
 def delete_apartment(db: Session, apartmentId: int):
-    db_apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
+    db_apartment = db.get(models.Apartment, apartmentId)
     if db_apartment:
         db.delete(db_apartment)
         db.commit()
+        invalidate_utility_stats()
         return True
     return False
 
-def update_apartment_status(db: Session, apartmentId: int, status: str):
-    """Update an apartment's status"""
-    db_apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
-    if db_apartment:
-        setattr(db_apartment, "status", status)
-        setattr(db_apartment, "updatedAt", datetime.utcnow())
-        db.commit()
-        db.refresh(db_apartment)
+def update_apartment_status(
+    db: Session,
+    apartmentId: int,
+    status: str,
+    expected_status: Optional[str] = None,
+    commit: bool = True
+):
+    """Update an apartment's status.
+
+    Con expected_status l'UPDATE è condizionale (compare-and-set): restituisce None se lo
+    stato attuale non è quello atteso, così due richieste concorrenti non vincono entrambe.
+    Con commit=False la modifica resta nella transazione corrente (e la riga bloccata)
+    fino al commit del chiamante, che deve anche invalidare la cache degli appartamenti.
+    """
+    # Singolo UPDATE ... RETURNING; le righe già nello stato richiesto non vengono riscritte
+    conditions = [
+        models.Apartment.id == apartmentId,
+        models.Apartment.status.is_distinct_from(status),
+    ]
+    if expected_status is not None:
+        conditions.append(models.Apartment.status == expected_status)
+    db_apartment = db.execute(
+        update(models.Apartment)
+        .where(*conditions)
+        .values(status=status, updatedAt=models.utcnow())
+        .returning(models.Apartment)
+    ).scalar_one_or_none()
+    if commit:
+        _commit_without_expire(db)
+        invalidate_apartment_cache()
+    if db_apartment is None and expected_status is None:
+        # Nessuna riga modificata: stato già uguale (oppure appartamento inesistente)
+        return db.get(models.Apartment, apartmentId)
     return db_apartment
 
 async def save_apartment_images(apartmentId: int, files: List[UploadFile]):
     """Save multiple apartment images and return the URLs."""
-    imageUrls = []
-    for file in files:
-        imageUrl = await save_apartment_image(apartmentId, file)
-        imageUrls.append(imageUrl)
-    return imageUrls
+    # La directory viene verificata una sola volta per tutto il batch
+    _ensure_dir(f"static/apartments/{apartmentId}")
+    # Salvataggi concorrenti; gather mantiene l'ordine dei file in input
+    return list(await asyncio.gather(*(save_apartment_image(apartmentId, file) for file in files)))
 
 async def save_apartment_image(apartmentId: int, file: UploadFile):
     """Save a single apartment image and return the URL."""
+    _check_upload_size(file)
+    
     # Create directory for apartment images if it doesn't exist
     upload_dir = f"static/apartments/{apartmentId}"
-    os.makedirs(upload_dir, exist_ok=True)
+    _ensure_dir(upload_dir)
     
     # Generate unique filename
     filename = f"{uuid.uuid4()}{os.path.splitext(file.filename)[1] if file.filename else '.jpg'}"
     file_path = f"{upload_dir}/{filename}"
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Save file (copia bloccante eseguita fuori dall'event loop)
+    await asyncio.to_thread(_copy_upload_to_path, file, file_path)
     
     # Return the URL path
     return f"/apartments/{apartmentId}/{filename}"
 
+async def save_apartment_image_stream(apartmentId: int, file_stream: AsyncIterator[bytes]):
+    """Save an apartment image streamed chunk by chunk (no temp file) and return the URL.
+
+    Il formato viene riconosciuto dai primi byte del contenuto (non dal Content-Type o
+    dal nome indicati dal client) e determina l'estensione del file salvato.
+    """
+    # Accumula i chunk iniziali finché non ci sono abbastanza byte per riconoscere il formato
+    chunks = file_stream.__aiter__()
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= 12:
+            break
+    if not head:
+        raise HTTPException(status_code=400, detail="File vuoto")
+    if len(head) > settings.max_upload_size:
+        raise HTTPException(status_code=413, detail="File troppo grande")
+    image_type = _sniff_image_type(head[:12])
+    if image_type is None:
+        raise HTTPException(status_code=400, detail="File non valido o non è un'immagine")
+
+    upload_dir = f"static/apartments/{apartmentId}"
+    _ensure_dir(upload_dir)
+
+    stored_name = f"{uuid.uuid4()}{_IMG_EXTENSIONS.get(image_type, '.' + image_type)}"
+    file_path = f"{upload_dir}/{stored_name}"
+
+    # Scrive direttamente su disco i chunk ricevuti dal client
+    written = len(head)
+    try:
+        async with aiofiles.open(file_path, "wb") as out_file:
+            await out_file.write(head)
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if written > settings.max_upload_size:
+                    raise HTTPException(status_code=413, detail="File troppo grande")
+                await out_file.write(chunk)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    return f"/apartments/{apartmentId}/{stored_name}"
+
 def update_apartment_images(db: Session, apartmentId: int, imageUrls: List[str], append: bool = False):
     """Update apartment images in the database."""
-    db_apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
-    
-    if db_apartment:
-        current_images = db_apartment.images or []    
-        if append:
-            # Add new images to existing ones
-            updated_images = current_images + imageUrls
-        else:
-            # Replace images
-            updated_images = imageUrls
-
-        setattr(db_apartment, "images", updated_images)
-        setattr(db_apartment, "updatedAt", datetime.utcnow())
-        db.commit()
-        db.refresh(db_apartment)
+    if not append:
+        # Sostituzione completa: nessun bisogno di caricare la riga
+        db_apartment = db.execute(
+            update(models.Apartment)
+            .where(models.Apartment.id == apartmentId)
+            .values(images=imageUrls, updatedAt=models.utcnow())
+            .returning(models.Apartment)
+        ).scalar_one_or_none()
+        _commit_without_expire(db)
+        invalidate_apartment_cache()
+        return db_apartment
+
+    return add_apartment_images_bulk(db, apartmentId, imageUrls)
+
+def add_apartment_images_bulk(db: Session, apartmentId: int, imageUrls: List[str]):
+    """Append several images to an apartment with a single UPDATE and commit."""
+    if imageUrls and _is_postgres(db):
+        # Append direttamente nel DB (jsonb ||): nessuna lettura della lista, nessun lost update
+        appended = _images_as_jsonb().op("||")(cast(literal(json.dumps(list(imageUrls))), JSONB))
+        db_apartment = db.execute(
+            update(models.Apartment)
+            .where(models.Apartment.id == apartmentId)
+            .values(images=cast(appended, models.Apartment.images.type), updatedAt=models.utcnow())
+            .returning(models.Apartment)
+        ).scalar_one_or_none()
+        _commit_without_expire(db)
+        invalidate_apartment_cache()
+        return db_apartment
+
+    # Fallback (SQLite): read-modify-write tramite ORM
+    db_apartment = db.get(models.Apartment, apartmentId)
+    
+    if db_apartment and imageUrls:
+        # Nuova lista: una mutazione in-place della colonna JSON non verrebbe rilevata dall'ORM
+        setattr(db_apartment, "images", list(db_apartment.images or []) + list(imageUrls))
+        _commit_without_expire(db)
+        invalidate_apartment_cache()
     return db_apartment
 
 def add_apartment_image(db: Session, apartmentId: int, imageUrl: str):
     """Add a single image to an apartment."""
-    db_apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
-    
-    if db_apartment:
-        current_images = db_apartment.images or []
-        if current_images is None:
-            current_images = [imageUrl]
-        else:
-            current_images.append(imageUrl)
+    return add_apartment_images_bulk(db, apartmentId, [imageUrl])
 
-        setattr(db_apartment, "images", current_images)
-        setattr(db_apartment, "updatedAt", datetime.utcnow())
-        db.commit()
-        db.refresh(db_apartment)
-    return db_apartment
+def delete_apartment_image(
+    db: Session,
+    apartmentId: int,
+    imageName: str,
+    background_tasks: Optional[BackgroundTasks] = None
+):
+    """Delete an image from an apartment.
 
-def delete_apartment_image(db: Session, apartmentId: int, imageName: str):
-    """Delete an image from an apartment."""
-    db_apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
-    if db_apartment is not None and db_apartment.images is not None:
-        imageUrl = f"/apartments/{apartmentId}/{imageName}"
-        if imageUrl in db_apartment.images:
-            db_apartment.images.remove(imageUrl)
-            setattr(db_apartment, "updatedAt", datetime.utcnow())
+    Il file fisico viene rimosso dopo il commit; se viene passato background_tasks
+    la rimozione avviene dopo l'invio della risposta.
+    """
+    imageUrl = f"/apartments/{apartmentId}/{imageName}"
+    
+    if _is_postgres(db):
+        # Un solo UPDATE: rimuove l'URL (jsonb -) solo se presente nella lista (jsonb @>)
+        result = db.execute(
+            update(models.Apartment)
+            .where(
+                models.Apartment.id == apartmentId,
+                _images_as_jsonb().op("@>")(cast(literal(json.dumps([imageUrl])), JSONB))
+            )
+            .values(
+                images=cast(_images_as_jsonb().op("-")(literal(imageUrl)), models.Apartment.images.type),
+                updatedAt=models.utcnow()
+            )
+            .execution_options(synchronize_session="fetch")
+        )
+        db.commit()
+        removed = result.rowcount > 0
+    else:
+        removed = False
+        db_apartment = db.get(models.Apartment, apartmentId)
+        if db_apartment is not None and db_apartment.images is not None and imageUrl in db_apartment.images:
+            db_apartment.images = [img for img in db_apartment.images if img != imageUrl]
             db.commit()
-            
-            # Try to delete the physical file
-            try:
-                os.remove(f"static{imageUrl}")
-            except:
-                pass
-            
-            return True
-    return False
+            removed = True
+    
+    if removed:
+        invalidate_apartment_cache()
+        _discard_file(f"static{imageUrl}", background_tasks)
+    return removed
+
+# Statement di ricerca costruiti una sola volta: a ogni chiamata cambiano solo i parametri
+_SEARCH_APARTMENTS_STMT = select(models.Apartment).where(
+    or_(
+        models.Apartment.name.ilike(bindparam("q")),
+        models.Apartment.description.ilike(bindparam("q"))
+    )
+)
+_SEARCH_APARTMENTS_RANKED_STMT = _ranked_by_similarity(
+    _SEARCH_APARTMENTS_STMT, models.Apartment.name, models.Apartment.description
+)
 
 def search_apartments(db: Session, query: str):
     """Search apartments by name or description."""
-    search = f"%{query}%"
-    return db.query(models.Apartment).filter(
-        or_(
-            models.Apartment.name.ilike(search),
-            models.Apartment.description.ilike(search)
-        )
-    ).all()
+    return _run_search(db, _SEARCH_APARTMENTS_STMT, _SEARCH_APARTMENTS_RANKED_STMT, query)
 
 def get_available_apartments(db: Session):
-    """Get apartments with status 'available'"""
-    return db.query(models.Apartment).filter(
-        models.Apartment.status == "available"
-    ).all()
+    """Get apartments with status 'available' (cached for settings.cache_expire_seconds)."""
+    # In cache vanno i modelli Pydantic già validati, mai istanze ORM legate a una sessione
+    return _cached(
+        _apartments_cache,
+        ("available",),
+        lambda: [schemas.Apartment.model_validate(apartment) for apartment in get_apartments(db, status="available")]
+    )
 
 def get_apartment_tenants(db: Session, apartmentId: int, user_id: Optional[int] = None):
     """Get all tenants associated with an apartment through active leases."""
-    # Query tenants through leases, filtered by apartment and user
-    query = db.query(models.Lease).filter(
-        models.Lease.apartmentId == apartmentId
+    # Tenant con contratto attivo sull'appartamento, filtrati direttamente in SQL
+    active_tenant_ids = select(models.Lease.tenantId).where(
+        models.Lease.apartmentId == apartmentId,
+        models.Lease.isActive
     )
     if user_id is not None:
-        query = query.filter(models.Lease.userId == user_id)
-    
-    leases = query.all()
-    
-    # Filter for active leases in Python
-    active_leases = [lease for lease in leases if lease.isActive]
-    
-    # Get unique tenant IDs
-    tenant_ids = {lease.tenantId for lease in active_leases}
-    
-    # Query tenants
-    tenants = db.query(models.Tenant).filter(models.Tenant.id.in_(tenant_ids)).all()
+        active_tenant_ids = active_tenant_ids.where(models.Lease.userId == user_id)
     
-    return tenants
+    # Righe leggere (nessun oggetto ORM): vengono solo serializzate
+    rows = db.execute(
+        select(*_TENANT_READ_COLUMNS).where(models.Tenant.id.in_(active_tenant_ids))
+    ).mappings().all()
+    return [dict(row) for row in rows]
 
 def get_apartment_utilities(
     db: Session, 
@@ -231,29 +701,12 @@ def get_apartment_utilities(
     user_id: Optional[int] = None
 ):
     """Get utility readings for an apartment with optional filters."""
-    query = db.query(models.UtilityReading).filter(
-        models.UtilityReading.apartmentId == apartmentId
+    stmt = select(models.UtilityReading).where(
+        models.UtilityReading.apartmentId == apartmentId,
+        *_equal_filters(models.UtilityReading, userId=user_id, type=type or None, subtype=subtype or None),
+        *_reading_period_filters(year or None, month or None)
     )
-    if user_id is not None:
-        query = query.filter(models.UtilityReading.userId == user_id)
-    
-    if type:
-        query = query.filter(models.UtilityReading.type == type)
-    
-    if subtype:
-        query = query.filter(models.UtilityReading.subtype == subtype)
-    
-    if year:
-        query = query.filter(
-            func.extract('year', models.UtilityReading.readingDate) == year
-        )
-    
-    if month:
-        query = query.filter(
-            func.extract('month', models.UtilityReading.readingDate) == month
-        )
-    
-    return query.order_by(models.UtilityReading.readingDate.desc()).all()
+    return db.scalars(stmt.order_by(models.UtilityReading.readingDate.desc())).all()
 
 def get_apartment_maintenance(
     db: Session, 
@@ -288,18 +741,18 @@ def get_apartment_leases(
     user_id: Optional[int] = None
 ):
     """Get leases for an apartment with optional active filter."""
-    query = db.query(models.Lease).filter(
+    query = db.query(models.Lease).options(
+        selectinload(models.Lease.documents)
+    ).filter(
         models.Lease.apartmentId == apartmentId
     )
     if user_id is not None:
         query = query.filter(models.Lease.userId == user_id)
     
-    leases = query.order_by(models.Lease.startDate.desc()).all()
-    
     if isActive is not None:
-        leases = [lease for lease in leases if lease.isActive == isActive]
-        
-    return leases
+        query = query.filter(_lease_active_filter(isActive))
+    
+    return query.order_by(models.Lease.startDate.desc()).all()
 
 def get_apartment_invoices(
     db: Session, 
@@ -310,22 +763,25 @@ def get_apartment_invoices(
     user_id: Optional[int] = None
 ):
     """Get invoices for an apartment with optional filters."""
-    query = db.query(models.Invoice).filter(
-        models.Invoice.apartmentId == apartmentId
+    return _get_invoices_for(db, models.Invoice.apartmentId == apartmentId, isPaid, year, month, user_id)
+
+def _get_invoices_for(
+    db: Session,
+    owner_condition,
+    isPaid: Optional[bool],
+    year: Optional[int],
+    month: Optional[int],
+    user_id: Optional[int]
+):
+    """Fatture di un appartamento/tenant (owner_condition) con filtri opzionali, con voci e pagamenti."""
+    stmt = select(models.Invoice).options(
+        selectinload(models.Invoice.items),
+        selectinload(models.Invoice.payments)
+    ).where(
+        owner_condition,
+        *_equal_filters(models.Invoice, userId=user_id, isPaid=isPaid, year=year or None, month=month or None)
     )
-    if user_id is not None:
-        query = query.filter(models.Invoice.userId == user_id)
-    
-    if isPaid is not None:
-        query = query.filter(models.Invoice.isPaid == isPaid)
-    
-    if year:
-        query = query.filter(models.Invoice.year == year)
-    
-    if month:
-        query = query.filter(models.Invoice.month == month)
-    
-    return query.order_by(models.Invoice.issueDate.desc()).all()
+    return db.scalars(stmt.order_by(models.Invoice.issueDate.desc())).all()
 
 
 
@@ -333,80 +789,68 @@ def get_apartment_invoices(
 # ----- Tenant Services -----
 
 def get_tenants(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None):
-    """Ottiene tutti i tenant con query ORM ottimizzata."""
-    try:
-        # Forza un commit e svuota completamente la cache
-        db.commit()
-        db.expire_all()
-        
-        # Usa query ORM standard che è più affidabile
-        query = db.query(models.Tenant)
-        if hasattr(models.Tenant, "deletedAt"):
-            query = query.filter(models.Tenant.deletedAt.is_(None))
-        if user_id is not None:
-            query = query.filter(models.Tenant.userId == user_id)
-        return query.order_by(models.Tenant.id.desc()).offset(skip).limit(limit).all()
-    except Exception as e:
-        print(f"Errore nella funzione get_tenants: {str(e)}")
-        # In caso di errore, riprova con una query più semplice
-        return db.query(models.Tenant).all()
+    """Ottiene i tenant (non eliminati) paginati, dal più recente."""
+    stmt = select(models.Tenant).where(models.Tenant.deletedAt.is_(None))
+    if user_id is not None:
+        stmt = stmt.where(models.Tenant.userId == user_id)
+    return db.scalars(
+        stmt.order_by(models.Tenant.id.desc()).offset(skip).limit(limit)
+    ).all()
+
+def get_tenants_summary(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None):
+    """Elenco leggero dei tenant: niente JSON delle preferenze, note o immagini documento."""
+    conditions = [
+        models.Tenant.deletedAt.is_(None),
+        *_equal_filters(models.Tenant, userId=user_id),
+    ]
+    stmt = select(models.Tenant).options(load_only(
+        models.Tenant.id,
+        models.Tenant.firstName,
+        models.Tenant.lastName,
+        models.Tenant.email,
+        models.Tenant.phone
+    )).where(*conditions)
+    return db.scalars(stmt.order_by(models.Tenant.id.desc()).offset(skip).limit(limit)).all()
 
 def get_tenant(db: Session, tenantId: int, user_id: Optional[int] = None):
-    query = db.query(models.Tenant).filter(models.Tenant.id == tenantId)
-    if user_id is not None:
-        query = query.filter(models.Tenant.userId == user_id)
-    return query.first()
+    return _get(db, models.Tenant, tenantId, user_id)
 
 def create_tenant(db: Session, tenant: schemas.TenantCreate, user_id: Optional[int] = None):
-    # Convert Pydantic model to dict
-    tenant_data = tenant.dict() if hasattr(tenant, "dict") else dict(tenant)
-    
-    # Handle nested dict for communication_preferences
-    if "communicationPreferences" in tenant_data:
-        if hasattr(tenant_data["communicationPreferences"], "dict"):
-            tenant_data["communicationPreferences"] = tenant_data["communicationPreferences"].dict()
+    # model_dump converte già ricorsivamente anche communicationPreferences
+    tenant_data = tenant.model_dump()
     
     # Associa l'utente se fornito (multi-tenancy)
     if user_id is not None:
         tenant_data["userId"] = user_id
 
-    db_tenant = models.Tenant(**tenant_data)
-    db.add(db_tenant)
-    
-    # Esegui flush prima del commit per assicurarti che tutte le operazioni siano completate
-    db.flush()
-    db.commit()
-    
-    # Ricarica dal database per assicurarti di avere la versione più recente
-    db.refresh(db_tenant)
+    # INSERT ... RETURNING: la riga completa (id, default) senza flush/refresh aggiuntivi
+    db_tenant = db.execute(
+        insert(models.Tenant).values(**tenant_data).returning(models.Tenant)
+    ).scalar_one()
+    _commit_without_expire(db)
     return db_tenant
 
 def update_tenant(db: Session, tenantId: int, tenant: schemas.TenantCreate):
-    db_tenant = db.query(models.Tenant).filter(models.Tenant.id == tenantId).first()
-    if db_tenant:
-        # Convert tenant data to dict
-        tenant_data = tenant.dict()
-        # Handle nested dict for communication_preferences
-        if hasattr(tenant_data["communicationPreferences"], "dict"):
-            tenant_data["communicationPreferences"] = tenant_data["communicationPreferences"].dict()
-        
-        for key, value in tenant_data.items():
-            setattr(db_tenant, key, value)
-        
-        setattr(db_tenant, "updatedAt", datetime.utcnow())
-        db.commit()
-        db.refresh(db_tenant)
+    # model_dump converte anche i modelli annidati (communicationPreferences) in dict
+    db_tenant = db.execute(
+        update(models.Tenant)
+        .where(models.Tenant.id == tenantId)
+        .values(**tenant.model_dump(), updatedAt=models.utcnow())
+        .returning(models.Tenant)
+    ).scalar_one_or_none()
+    _commit_without_expire(db)
     return db_tenant
 
 def delete_tenant(db: Session, tenantId: int):
     """Delete a tenant and all associated files (Local + R2)."""
-    db_tenant = db.query(models.Tenant).filter(models.Tenant.id == tenantId).first()
+    db_tenant = db.get(models.Tenant, tenantId)
     if db_tenant:
         # 1. Elimina cartella locale (Legacy)
         try:
             tenant_dir = f"static/tenants/{tenantId}"
             if os.path.exists(tenant_dir):
                 shutil.rmtree(tenant_dir)
+                forget_upload_dirs(tenant_dir)
                 print(f"Deleted local tenant directory: {tenant_dir}")
         except Exception as e:
             print(f"Error deleting local tenant directory: {e}")
@@ -427,71 +871,168 @@ def delete_tenant(db: Session, tenantId: int):
     return False
 
 def update_tenant_communication_preferences(db: Session, tenantId: int, preferences: schemas.CommunicationPreferences):
-    db_tenant = db.query(models.Tenant).filter(models.Tenant.id == tenantId).first()
-    if db_tenant:
-        setattr(db_tenant, "communicationPreferences", preferences.dict())
-        setattr(db_tenant, "updatedAt", datetime.utcnow())
-        db.commit()
-        db.refresh(db_tenant)
+    db_tenant = db.execute(
+        update(models.Tenant)
+        .where(models.Tenant.id == tenantId)
+        .values(communicationPreferences=preferences.model_dump(), updatedAt=models.utcnow())
+        .returning(models.Tenant)
+    ).scalar_one_or_none()
+    _commit_without_expire(db)
     return db_tenant
 
-# In service.py
+# Firme (magic number) dei formati immagine accettati per i documenti
+_IMG_MAGICS = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+)
+
+# Estensione dei file salvati per formato riconosciuto (default: ".<formato>")
+_IMG_EXTENSIONS = {"jpeg": ".jpg", "tiff": ".tif"}
+
+# Brand ISO-BMFF (box 'ftyp' all'offset 4) delle foto HEIC/HEIF/AVIF scattate dagli smartphone
+_IMG_FTYP_BRANDS = {
+    b"heic": "heic", b"heix": "heic", b"heim": "heic", b"heis": "heic",
+    b"hevc": "heic", b"mif1": "heif", b"msf1": "heif", b"avif": "avif",
+}
+
+def _sniff_image_type(head: bytes) -> Optional[str]:
+    """Riconosce il formato immagine dai primi 12 byte (sostituisce imghdr, deprecato)."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp":
+        return _IMG_FTYP_BRANDS.get(head[8:12])
+    for magic, image_type in _IMG_MAGICS:
+        if head.startswith(magic):
+            return image_type
+    return None
+
+def _persist_upload(file: UploadFile, file_path: str):
+    """Scrive l'upload su un file temporaneo e lo rinomina nel nome finale.
+
+    Eseguita interamente in un thread: restituisce False (file vuoto) dopo aver
+    rimosso quanto scritto.
+    """
+    # Temporaneo univoco: upload concorrenti possono puntare allo stesso nome finale
+    temp_path = f"{file_path}.{uuid.uuid4().hex}.temp"
+    try:
+        _copy_upload_to_path(file, temp_path)
+        if os.path.getsize(temp_path) == 0:
+            os.remove(temp_path)
+            return False
+        # Rinomina il file temporaneo nel nome finale (operazione atomica)
+        os.replace(temp_path, file_path)
+        return True
+    except Exception:
+        for path in (temp_path, file_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+def _upload_digest(file: UploadFile) -> str:
+    """Hash breve (blake2b, 8 byte) del contenuto dell'upload; riporta il file all'inizio."""
+    digest = hashlib.blake2b(digest_size=8)
+    file.file.seek(0)
+    for chunk in iter(lambda: file.file.read(_UPLOAD_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.file.seek(0)
+    return digest.hexdigest()
+
+def _persist_content_addressed(file: UploadFile, upload_dir: str, prefix: str, extension: str) -> Optional[str]:
+    """Salva l'upload come {prefix}_{hash}{extension} e restituisce il nome del file.
+
+    Se un file con lo stesso contenuto esiste già non viene riscritto. Restituisce None
+    per un upload vuoto.
+    """
+    filename = f"{prefix}_{_upload_digest(file)}{extension}"
+    file_path = f"{upload_dir}/{filename}"
+    if os.path.isfile(file_path):
+        return filename
+    return filename if _persist_upload(file, file_path) else None
+
+def _tenant_references_path(db_tenant: models.Tenant, path: str) -> bool:
+    """True se il fronte o il retro del documento del tenant puntano al file path."""
+    return any(
+        url and _static_path(url) == path
+        for url in (db_tenant.documentFrontImage, db_tenant.documentBackImage)
+    )
+
+def _remove_tenant_document_if_unreferenced(tenantId: int, path: str):
+    """Elimina il file di un documento solo se il tenant non lo referenzia più.
+
+    Eseguita dopo la risposta: nel frattempo un upload con lo stesso contenuto (stesso
+    nome, file non riscritto) può aver fatto tornare il tenant su quel percorso.
+    """
+    with SessionLocal() as db:
+        db_tenant = db.get(models.Tenant, tenantId)
+        if db_tenant is not None and _tenant_references_path(db_tenant, path):
+            return
+    _remove_file_quietly(path)
+
+def _discard_tenant_document(
+    db_tenant: models.Tenant,
+    path: str,
+    background_tasks: Optional[BackgroundTasks] = None
+):
+    """Rimuove un file di documento sostituito/eliminato, se non è ancora referenziato.
+
+    I nomi sono content-addressed: lo stesso contenuto caricato di nuovo produce lo
+    stesso percorso, che non va eliminato.
+    """
+    if _tenant_references_path(db_tenant, path):
+        return
+    if background_tasks is not None:
+        background_tasks.add_task(_remove_tenant_document_if_unreferenced, db_tenant.id, path)
+    else:
+        _remove_file_quietly(path)
+
 async def save_tenant_document(tenantId: int, file: UploadFile, doc_type: str):
     """Salva in modo efficiente il documento di un tenant e restituisce l'URL."""
     # Validazione del tipo di file
     content_type = file.content_type
     if not content_type or not content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Il file deve essere un'immagine")
+    _check_upload_size(file)
     
     # Crea directory con permessi corretti
     upload_dir = f"static/tenants/{tenantId}/documents"
-    os.makedirs(upload_dir, exist_ok=True, mode=0o755)
+    _ensure_dir(upload_dir, mode=0o755)
     
-    # Genera nome file più univoco per evitare collisioni
-    timestamp = int(time.time())
-    random_uuid = uuid.uuid4().hex
     extension = os.path.splitext(file.filename)[1] if file.filename else ".jpg"
     
-    filename = f"{doc_type}_{timestamp}_{random_uuid}{extension}"
-    file_path = f"{upload_dir}/{filename}"
+    # Verifica il tipo di file prima di scrivere su disco (prevenire upload di file
+    # dannosi mascherati da immagini): bastano i primi 12 byte già in memoria
+    head = await file.read(12)
+    await file.seek(0)
+    if not _sniff_image_type(head):
+        raise HTTPException(status_code=400, detail="File non valido o non è un'immagine")
     
     try:
-        # Usa una copia temporanea del file prima di spostarlo nella posizione finale
-        temp_path = f"{file_path}.temp"
-        
-        # Utilizzare aiofiles per operazioni asincrone più efficienti
-        async with aiofiles.open(temp_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
-        
-        # Verifica che il file temporaneo sia stato scritto correttamente
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            raise HTTPException(status_code=500, detail="Errore durante il salvataggio del file")
-        
-        # Rinomina il file temporaneo nel nome finale (operazione atomica)
-        os.rename(temp_path, file_path)
-        
-        # Verifica il tipo di file (prevenire upload di file dannosi mascherati da immagini)
-        file_type = imghdr.what(file_path)
-        if not file_type:
-            os.remove(file_path)
-            raise HTTPException(status_code=400, detail="File non valido o non è un'immagine")
-            
+        # Hash, copia e rename in un'unica operazione nel threadpool
+        filename = await asyncio.to_thread(_persist_content_addressed, file, upload_dir, doc_type, extension)
     except Exception as e:
-        # Gestione errori con pulizia
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Errore durante il salvataggio: {str(e)}")
     
-    # Prepara l'URL con parametro di cache-busting
-    file_url = f"/tenants/{tenantId}/documents/{filename}?v={timestamp}"
-    return file_url
+    if not filename:
+        raise HTTPException(status_code=500, detail="Errore durante il salvataggio del file")
+    
+    # Il nome contiene l'hash del contenuto: cambia solo se cambia l'immagine,
+    # quindi fa anche da cache-busting (niente più ?v=timestamp)
+    return f"/tenants/{tenantId}/documents/{filename}"
 
-def update_tenant_document(db: Session, tenantId: int, doc_url: str, doc_type: str):
+def update_tenant_document(
+    db: Session,
+    tenantId: int,
+    doc_url: str,
+    doc_type: str,
+    background_tasks: Optional[BackgroundTasks] = None
+):
     """Aggiorna il riferimento all'immagine del documento in modo atomico."""
-    db_tenant = db.query(models.Tenant).filter(models.Tenant.id == tenantId).first()
+    db_tenant = db.get(models.Tenant, tenantId)
     if not db_tenant:
         raise HTTPException(status_code=404, detail="Tenant non trovato")
     
@@ -508,23 +1049,12 @@ def update_tenant_document(db: Session, tenantId: int, doc_url: str, doc_type: s
         else:
             raise ValueError(f"Tipo di documento non valido: {doc_type}")
         
-        db_tenant.updatedAt = datetime.utcnow()
         db.commit()
         
         # Elimina il vecchio file dopo aver aggiornato il DB con successo
-        if old_url and old_url != doc_url and old_url != "":
-            try:
-                # Estrai il percorso del file senza parametri di query
-                old_path = old_url.split('?')[0]
-                old_file_path = f"static{old_path}"
-                if os.path.exists(old_file_path) and os.path.isfile(old_file_path):
-                    os.remove(old_file_path)
-                    print(f"File eliminato: {old_file_path}")
-                else:
-                    print(f"File non trovato: {old_file_path}")
-            except Exception as e:
-                # Logga l'errore ma non interrompere l'operazione principale
-                print(f"Errore nella pulizia del file precedente: {e}")
+        # (un file già assente o un errore di rimozione non interrompono l'operazione)
+        if old_url:
+            _discard_tenant_document(db_tenant, _static_path(old_url), background_tasks)
         
         return db_tenant
     
@@ -532,9 +1062,14 @@ def update_tenant_document(db: Session, tenantId: int, doc_url: str, doc_type: s
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Errore durante l'aggiornamento: {str(e)}")
     
-async def delete_tenant_document(db: Session, tenantId: int, doc_type: str):
+async def delete_tenant_document(
+    db: Session,
+    tenantId: int,
+    doc_type: str,
+    background_tasks: Optional[BackgroundTasks] = None
+):
     """Elimina l'immagine del documento in modo sicuro e atomico."""
-    db_tenant = db.query(models.Tenant).filter(models.Tenant.id == tenantId).first()
+    db_tenant = db.get(models.Tenant, tenantId)
     if not db_tenant:
         raise HTTPException(status_code=404, detail="Tenant non trovato")
     
@@ -552,16 +1087,11 @@ async def delete_tenant_document(db: Session, tenantId: int, doc_type: str):
         else:
             return {"detail": "Nessun documento da eliminare"}
         
-        db_tenant.updatedAt = datetime.utcnow()
         db.commit()
         
         # Elimina il file fisicamente
         if file_url:
-            # Rimuovi eventuali parametri di query dall'URL
-            clean_url = file_url.split('?')[0]
-            file_path = f"static{clean_url}"
-            if os.path.exists(file_path) and os.path.isfile(file_path):
-                os.remove(file_path)
+            _discard_tenant_document(db_tenant, _static_path(file_url), background_tasks)
         
         return {"detail": "Documento eliminato con successo", "success": True}
         
@@ -571,11 +1101,7 @@ async def delete_tenant_document(db: Session, tenantId: int, doc_type: str):
     
 def create_tenant_without_commit(db: Session, tenant: schemas.TenantCreate, user_id: Optional[int] = None):
     """Crea un tenant senza fare commit della transazione."""
-    tenant_data = tenant.dict() if hasattr(tenant, "dict") else dict(tenant)
-    
-    if "communicationPreferences" in tenant_data:
-        if hasattr(tenant_data["communicationPreferences"], "dict"):
-            tenant_data["communicationPreferences"] = tenant_data["communicationPreferences"].dict()
+    tenant_data = tenant.model_dump()
     
     # Associa l'utente se fornito (multi-tenancy)
     if user_id is not None:
@@ -588,18 +1114,18 @@ def create_tenant_without_commit(db: Session, tenant: schemas.TenantCreate, user
 
 def get_tenant_leases(db: Session, tenantId: int, isActive: Optional[bool] = None, user_id: Optional[int] = None):
     """Get leases for a tenant with optional active filter."""
-    query = db.query(models.Lease).filter(
+    query = db.query(models.Lease).options(
+        selectinload(models.Lease.documents)
+    ).filter(
         models.Lease.tenantId == tenantId
     )
     if user_id is not None:
         query = query.filter(models.Lease.userId == user_id)
     
-    leases = query.order_by(models.Lease.startDate.desc()).all()
-    
     if isActive is not None:
-        leases = [lease for lease in leases if lease.isActive == isActive]
-        
-    return leases
+        query = query.filter(_lease_active_filter(isActive))
+    
+    return query.order_by(models.Lease.startDate.desc()).all()
 
 def get_tenant_invoices(
     db: Session, 
@@ -610,50 +1136,76 @@ def get_tenant_invoices(
     user_id: Optional[int] = None
 ):
     """Get invoices for a tenant with optional filters."""
-    query = db.query(models.Invoice).filter(
-        models.Invoice.tenantId == tenantId
-    )
-    if user_id is not None:
-        query = query.filter(models.Invoice.userId == user_id)
-    
-    if isPaid is not None:
-        query = query.filter(models.Invoice.isPaid == isPaid)
-    
-    if year:
-        query = query.filter(models.Invoice.year == year)
-    
-    if month:
-        query = query.filter(models.Invoice.month == month)
-    
-    return query.order_by(models.Invoice.issueDate.desc()).all()
+    return _get_invoices_for(db, models.Invoice.tenantId == tenantId, isPaid, year, month, user_id)
 
 def get_tenant_payment_history(db: Session, tenantId: int, user_id: Optional[int] = None):
     """Get payment history for a tenant."""
     # This query gets all payment records for invoices associated with this tenant
-    query = db.query(models.PaymentRecord).join(
+    stmt = select(*_PAYMENT_RECORD_READ_COLUMNS).join(
         models.Invoice,
         models.PaymentRecord.invoiceId == models.Invoice.id
-    ).filter(
+    ).where(
         models.Invoice.tenantId == tenantId
     )
     if user_id is not None:
-        query = query.filter(models.Invoice.userId == user_id)
-    return query.order_by(models.PaymentRecord.paymentDate.desc()).all()
+        stmt = stmt.where(models.Invoice.userId == user_id)
+    rows = db.execute(stmt.order_by(models.PaymentRecord.paymentDate.desc())).mappings().all()
+    return [dict(row) for row in rows]
+
+_TENANT_SEARCH_ILIKE = or_(
+    models.Tenant.firstName.ilike(bindparam("q")),
+    models.Tenant.lastName.ilike(bindparam("q")),
+    models.Tenant.email.ilike(bindparam("q")),
+    models.Tenant.documentNumber.ilike(bindparam("q"))
+)
+_SEARCH_TENANTS_STMT = select(models.Tenant).where(_TENANT_SEARCH_ILIKE)
+_SEARCH_TENANTS_FOR_USER_STMT = _SEARCH_TENANTS_STMT.where(models.Tenant.userId == bindparam("user_id"))
+_TENANT_SEARCH_COLUMNS = (
+    models.Tenant.firstName,
+    models.Tenant.lastName,
+    models.Tenant.email,
+    models.Tenant.documentNumber,
+)
+_SEARCH_TENANTS_RANKED_STMT = _ranked_by_similarity(_SEARCH_TENANTS_STMT, *_TENANT_SEARCH_COLUMNS)
+_SEARCH_TENANTS_RANKED_FOR_USER_STMT = _ranked_by_similarity(_SEARCH_TENANTS_FOR_USER_STMT, *_TENANT_SEARCH_COLUMNS)
+
+# Full-text (PostgreSQL): match per prefisso di parola sull'indice GIN ix_tenants_search_tsv,
+# unito ai match per sottostringa/refuso degli indici trigram (BitmapOr dei due indici).
+# Prima i match full-text per ts_rank, poi gli altri per similarità trigram
+_TENANT_SEARCH_VECTOR = literal_column(models.TENANT_SEARCH_VECTOR_SQL)
+_TENANT_SEARCH_TSQUERY = func.to_tsquery("simple", bindparam("tsquery"))
+_SEARCH_TENANTS_FTS_STMT = select(models.Tenant).where(
+    or_(_TENANT_SEARCH_VECTOR.op("@@")(_TENANT_SEARCH_TSQUERY), _TENANT_SEARCH_ILIKE)
+).order_by(
+    func.ts_rank(_TENANT_SEARCH_VECTOR, _TENANT_SEARCH_TSQUERY).desc(),
+    func.greatest(*(func.similarity(column, bindparam("term")) for column in _TENANT_SEARCH_COLUMNS)).desc()
+)
+_SEARCH_TENANTS_FTS_FOR_USER_STMT = _SEARCH_TENANTS_FTS_STMT.where(models.Tenant.userId == bindparam("user_id"))
+
+def _prefix_tsquery(query: str) -> Optional[str]:
+    """'mario ros' -> 'mario:* & ros:*' (ricerca per prefisso di parola)."""
+    words = re.findall(r"\w+", query)
+    return " & ".join(f"{word}:*" for word in words) or None
 
 def search_tenants(db: Session, query: str, user_id: Optional[int] = None):
     """Search tenants by name, email, or document number."""
-    search = f"%{query}%"
-    q = db.query(models.Tenant).filter(
-        or_(
-            models.Tenant.firstName.ilike(search),
-            models.Tenant.lastName.ilike(search),
-            models.Tenant.email.ilike(search),
-            models.Tenant.documentNumber.ilike(search)
-        )
-    )
+    query = (query or "").strip()
+    tsquery = _prefix_tsquery(query)
+    if tsquery and _is_postgres(db) and len(query) >= _MIN_SEARCH_LENGTH:
+        # Un solo statement: match full-text e trigram/ILIKE insieme, ordinati per rilevanza
+        params = {"tsquery": tsquery, "q": f"%{query}%", "term": query}
+        stmt = _SEARCH_TENANTS_FTS_STMT
+        if user_id is not None:
+            params["user_id"] = user_id
+            stmt = _SEARCH_TENANTS_FTS_FOR_USER_STMT
+        return db.scalars(stmt, params).all()
+    
+    # Altri DB (o termine senza parole): ricerca ILIKE/trigram per sottostringhe
     if user_id is not None:
-        q = q.filter(models.Tenant.userId == user_id)
-    return q.all()
+        return _run_search(
+            db, _SEARCH_TENANTS_FOR_USER_STMT, _SEARCH_TENANTS_RANKED_FOR_USER_STMT, query, {"user_id": user_id}
+        )
+    return _run_search(db, _SEARCH_TENANTS_STMT, _SEARCH_TENANTS_RANKED_STMT, query)
 
 
 
@@ -669,33 +1221,20 @@ def get_leases(
     user_id: Optional[int] = None
 ):
     """Get leases with optional filters."""
-    query = db.query(models.Lease)
-    if hasattr(models.Lease, "deletedAt"):
-        query = query.filter(models.Lease.deletedAt.is_(None))
-    if user_id is not None:
-        query = query.filter(models.Lease.userId == user_id)
-    
-    if tenantId is not None:
-        query = query.filter(models.Lease.tenantId == tenantId)
-    
-    if apartmentId is not None:
-        query = query.filter(models.Lease.apartmentId == apartmentId)
-    
-    all_leases = query.offset(skip).limit(limit).all()
-    
+    conditions = [
+        models.Lease.deletedAt.is_(None),
+        *_equal_filters(models.Lease, userId=user_id, tenantId=tenantId, apartmentId=apartmentId),
+    ]
+    # Lo stato va filtrato prima di offset/limit, altrimenti la paginazione salta righe
     if status is not None:
-        all_leases = [lease for lease in all_leases if lease.status == status]
-        
-    return all_leases
+        conditions.append(_lease_status_filter(status))
+    
+    stmt = select(models.Lease).options(selectinload(models.Lease.documents)).where(*conditions)
+    return db.scalars(stmt.offset(skip).limit(limit)).all()
 
 def get_lease(db: Session, leaseId: int, user_id: Optional[int] = None):
     """Get a specific lease by ID."""
-    query = db.query(models.Lease).filter(models.Lease.id == leaseId)
-    if hasattr(models.Lease, "deletedAt"):
-        query = query.filter(models.Lease.deletedAt.is_(None))
-    if user_id is not None:
-        query = query.filter(models.Lease.userId == user_id)
-    return query.first()
+    return _get(db, models.Lease, leaseId, user_id)
 
 def get_lease_payment_history(db: Session, lease_id: int, page: int = 1, size: int = 20, user_id: Optional[int] = None):
     """Get optimized payment history for a lease (invoice payments only)."""
@@ -811,99 +1350,105 @@ def create_lease(db: Session, lease: schemas.LeaseCreate, user_id: Optional[int]
                 db.flush() # Per ottenere l'ID senza fare commit
                 data[id_field] = new_reading.id
     
-    db_lease = models.Lease(**data)
-    db.add(db_lease)
-    db.commit()
-    db.refresh(db_lease)
+    db_lease = db.execute(
+        insert(models.Lease).values(**data).returning(models.Lease)
+    ).scalar_one()
+    _commit_without_expire(db)
+    if initial_readings:
+        # Le letture di baseline create qui entrano nelle statistiche
+        invalidate_utility_stats()
     return db_lease
 
 def update_lease(db: Session, leaseId: int, lease: schemas.LeaseCreate):
     """Update an existing lease."""
-    db_lease = db.query(models.Lease).filter(models.Lease.id == leaseId).first()
-    if db_lease:
-        for key, value in lease.dict().items():
-            setattr(db_lease, key, value)
-        
-        setattr(db_lease, "updatedAt", datetime.utcnow())
-        db.commit()
-        db.refresh(db_lease)
+    # initialReadings è usato solo in creazione e non è una colonna
+    db_lease = db.execute(
+        update(models.Lease)
+        .where(models.Lease.id == leaseId)
+        .values(**lease.dict(exclude={"initialReadings"}), updatedAt=models.utcnow())
+        .returning(models.Lease)
+    ).scalar_one_or_none()
+    _commit_without_expire(db)
     return db_lease
 
-def delete_lease(db: Session, leaseId: int):
-    """Delete a lease and its associated documents (Local + R2)."""
-    db_lease = db.query(models.Lease).filter(models.Lease.id == leaseId).first()
-    if db_lease:
-        # 1. Elimina documenti associati
-        lease_docs = db.query(models.LeaseDocument).filter(models.LeaseDocument.leaseId == leaseId).all()
-        
-        try:
-            from app.services.r2_manager import R2Manager
-            r2 = R2Manager()
-            # 1. Elimina cartella documenti/contratti da R2
-            r2.delete_folder(f"{leaseId}/", 'contratto')
-            
-            # 1.1 Elimina cartella fatture da R2 (Bucket prospetti-mensili)
-            r2.delete_folder(f"{leaseId}/", 'prospetto')
-        except Exception as e:
-            print(f"Error deleting lease documents/invoices from R2: {e}")
+def _remove_lease_files(leaseId: int):
+    """Elimina documenti e prospetti del contratto da R2 e l'eventuale cartella locale (legacy)."""
+    try:
+        from app.services.r2_manager import R2Manager
+        r2 = R2Manager()
+        # Cartella documenti/contratti e cartella fatture (bucket prospetti-mensili)
+        r2.delete_folder(f"{leaseId}/", 'contratto')
+        r2.delete_folder(f"{leaseId}/", 'prospetto')
+    except Exception as e:
+        logger.warning("Errore eliminazione documenti/fatture del contratto %d da R2: %s", leaseId, e)
+    
+    lease_dir = f"static/leases/{leaseId}"
+    shutil.rmtree(lease_dir, ignore_errors=True)
+    forget_upload_dirs(lease_dir)
 
-        # 2. Elimina eventuali cartelle locali (Legacy)
-        try:
-            lease_dir = f"static/leases/{leaseId}"
-            if os.path.exists(lease_dir):
-                shutil.rmtree(lease_dir)
-        except:
-             pass
+def delete_lease(db: Session, leaseId: int, background_tasks: Optional[BackgroundTasks] = None):
+    """Delete a lease and its associated documents (Local + R2).
 
+    La riga viene eliminata e confermata subito; i file (R2 e locali) vengono rimossi
+    dopo il commit, in background se è disponibile background_tasks, così nessun lock
+    resta aperto durante le chiamate di rete.
+    """
+    db_lease = db.get(models.Lease, leaseId)
+    if db_lease:
         db.delete(db_lease)
         db.commit()
+        # Le fatture del contratto sono eliminate in cascata (Lease.invoices)
+        invalidate_invoice_stats()
+        
+        if background_tasks is not None:
+            background_tasks.add_task(_remove_lease_files, leaseId)
+        else:
+            _remove_lease_files(leaseId)
         return True
     return False
 
 def get_expiring_leases(db: Session, days_threshold: int = 30):
     """Get leases that are expiring within the specified number of days."""
-    today = datetime.utcnow().date()
+    today = date.today()
     expiry_date = today + timedelta(days=days_threshold)
     
-    # Fetch all potentially relevant leases from the DB
-    leases = db.query(models.Lease).filter(
-        models.Lease.endDate <= expiry_date,
-        models.Lease.endDate >= today
+    # isActive (today < endDate) è incluso nel range: un'unica scansione su ix_leases_endDate_covering
+    return db.query(models.Lease).options(
+        selectinload(models.Lease.documents)
+    ).filter(
+        models.Lease.endDate > today,
+        models.Lease.endDate <= expiry_date
     ).order_by(models.Lease.endDate).all()
-    
-    # Filter for active leases in Python
-    active_expiring_leases = [lease for lease in leases if lease.isActive]
-    
-    return active_expiring_leases
 
 async def save_lease_document(leaseId: int, file: UploadFile):
     """Save a lease document file and return the URL."""
+    _check_upload_size(file)
+    
     # Create directory for lease documents if it doesn't exist
     upload_dir = f"static/leases/{leaseId}/documents"
-    os.makedirs(upload_dir, exist_ok=True)
+    _ensure_dir(upload_dir)
     
     # Generate unique filename
     filename = f"{uuid.uuid4()}{os.path.splitext(file.filename)[1] if file.filename else '.jpg'}"
     file_path = f"{upload_dir}/{filename}"
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Save file (copia bloccante eseguita fuori dall'event loop)
+    await asyncio.to_thread(_copy_upload_to_path, file, file_path)
     
     # Return the URL path
     return f"/leases/{leaseId}/documents/{filename}"
 
 def create_lease_document(db: Session, document: schemas.LeaseDocumentCreate):
     """Create a new lease document record."""
-    db_document = models.LeaseDocument(**document.dict())
-    db.add(db_document)
-    db.commit()
-    db.refresh(db_document)
+    db_document = db.execute(
+        insert(models.LeaseDocument).values(**document.dict()).returning(models.LeaseDocument)
+    ).scalar_one()
+    _commit_without_expire(db)
     return db_document
 
 def get_lease_document(db: Session, document_id: int):
     """Get a specific lease document by ID."""
-    return db.query(models.LeaseDocument).filter(models.LeaseDocument.id == document_id).first()
+    return db.get(models.LeaseDocument, document_id)
 
 def get_lease_documents(db: Session, leaseId: int, user_id: Optional[int] = None):
     """Get all documents for a specific lease."""
@@ -914,7 +1459,7 @@ def get_lease_documents(db: Session, leaseId: int, user_id: Optional[int] = None
 
 def delete_lease_document(db: Session, document_id: int):
     """Delete a lease document (Local or R2)."""
-    db_document = db.query(models.LeaseDocument).filter(models.LeaseDocument.id == document_id).first()
+    db_document = db.get(models.LeaseDocument, document_id)
     if db_document:
         # 1. Tenta eliminazione da R2 se non è path locale o se R2 è configurato
         if db_document.url and not db_document.url.startswith('/'):
@@ -945,25 +1490,32 @@ def delete_lease_document(db: Session, document_id: int):
     return False
 
 
+# Search by tenant name or apartment name
+_SEARCH_LEASES_STMT = select(models.Lease).options(
+    selectinload(models.Lease.documents)
+).join(
+    models.Tenant, models.Lease.tenantId == models.Tenant.id
+).join(
+    models.Apartment, models.Lease.apartmentId == models.Apartment.id
+).where(
+    or_(
+        models.Tenant.firstName.ilike(bindparam("q")),
+        models.Tenant.lastName.ilike(bindparam("q")),
+        models.Apartment.name.ilike(bindparam("q"))
+    )
+)
+_SEARCH_LEASES_FOR_USER_STMT = _SEARCH_LEASES_STMT.where(models.Lease.userId == bindparam("user_id"))
+_LEASE_SEARCH_COLUMNS = (models.Tenant.firstName, models.Tenant.lastName, models.Apartment.name)
+_SEARCH_LEASES_RANKED_STMT = _ranked_by_similarity(_SEARCH_LEASES_STMT, *_LEASE_SEARCH_COLUMNS)
+_SEARCH_LEASES_RANKED_FOR_USER_STMT = _ranked_by_similarity(_SEARCH_LEASES_FOR_USER_STMT, *_LEASE_SEARCH_COLUMNS)
+
 def search_leases(db: Session, query: str, user_id: Optional[int] = None):
     """Search leases by associated tenant or apartment."""
-    search = f"%{query}%"
-    
-    # Search by tenant name or apartment name
-    q = db.query(models.Lease).join(
-        models.Tenant, models.Lease.tenantId == models.Tenant.id
-    ).join(
-        models.Apartment, models.Lease.apartmentId == models.Apartment.id
-    ).filter(
-        or_(
-            models.Tenant.firstName.ilike(search),
-            models.Tenant.lastName.ilike(search),
-            models.Apartment.name.ilike(search)
-        )
-    )
     if user_id is not None:
-        q = q.filter(models.Lease.userId == user_id)
-    return q.all()
+        return _run_search(
+            db, _SEARCH_LEASES_FOR_USER_STMT, _SEARCH_LEASES_RANKED_FOR_USER_STMT, query, {"user_id": user_id}
+        )
+    return _run_search(db, _SEARCH_LEASES_STMT, _SEARCH_LEASES_RANKED_STMT, query)
 
 
 
@@ -984,57 +1536,45 @@ def get_utility_readings(
     user_id: Optional[int] = None
 ):
     """Get utility readings with optional filters."""
-    query = db.query(models.UtilityReading)
-    if user_id is not None:
-        query = query.filter(models.UtilityReading.userId == user_id)
-    if hasattr(models.UtilityReading, "deletedAt"):
-        query = query.filter(models.UtilityReading.deletedAt.is_(None))
-    
-    if apartmentId is not None:
-        query = query.filter(models.UtilityReading.apartmentId == apartmentId)
-    
-    if type is not None:
-        query = query.filter(models.UtilityReading.type == type)
-    
-    if subtype is not None:
-        query = query.filter(models.UtilityReading.subtype == subtype)
-    
-    if year is not None:
-        query = query.filter(func.extract('year', models.UtilityReading.readingDate) == year)
-    
-    if month is not None:
-        query = query.filter(func.extract('month', models.UtilityReading.readingDate) == month)
-    
-    if isPaid is not None:
-        query = query.filter(models.UtilityReading.isPaid == isPaid)
-    
-    return query.order_by(models.UtilityReading.readingDate.desc()).offset(skip).limit(limit).all()
+    stmt = select(models.UtilityReading).where(
+        models.UtilityReading.deletedAt.is_(None),
+        *_equal_filters(
+            models.UtilityReading,
+            userId=user_id,
+            apartmentId=apartmentId,
+            type=type,
+            subtype=subtype,
+            isPaid=isPaid,
+        ),
+        *_reading_period_filters(year, month)
+    )
+    return db.scalars(
+        stmt.order_by(models.UtilityReading.readingDate.desc()).offset(skip).limit(limit)
+    ).all()
 
 def get_utility_reading(db: Session, reading_id: int, user_id: Optional[int] = None):
     """Get a specific utility reading by ID."""
-    query = db.query(models.UtilityReading).filter(models.UtilityReading.id == reading_id)
-    if user_id is not None:
-        query = query.filter(models.UtilityReading.userId == user_id)
-    if hasattr(models.UtilityReading, "deletedAt"):
-        query = query.filter(models.UtilityReading.deletedAt.is_(None))
-    return query.first()
+    return _get(db, models.UtilityReading, reading_id, user_id)
 
 def get_last_utility_reading(db: Session, apartmentId: int, type: str, subtype: Optional[str] = None):
     """Get the last utility reading for a specific apartment and type."""
-    query = db.query(models.UtilityReading).filter(
+    # lambda_stmt: l'SQL compilato è in cache per posizione nel codice, i valori catturati
+    # (apartmentId, type, subtype) diventano parametri bound a ogni chiamata
+    stmt = lambda_stmt(lambda: select(models.UtilityReading).where(
         models.UtilityReading.apartmentId == apartmentId,
         models.UtilityReading.type == type,
         # Escludi le letture speciali (baseline di contratto): non devono essere usate come "precedente"
         models.UtilityReading.isSpecialReading == False
-    )
+    ))
     
     if subtype == "main":
         # Per le utenze principali, cerchiamo 'main' ma accettiamo None (legacy)
-        query = query.filter(or_(models.UtilityReading.subtype == "main", models.UtilityReading.subtype.is_(None)))
+        stmt += lambda s: s.where(or_(models.UtilityReading.subtype == "main", models.UtilityReading.subtype.is_(None)))
     elif subtype is not None:
-        query = query.filter(models.UtilityReading.subtype == subtype)
+        stmt += lambda s: s.where(models.UtilityReading.subtype == subtype)
     
-    return query.order_by(models.UtilityReading.readingDate.desc()).first()
+    stmt += lambda s: s.order_by(models.UtilityReading.readingDate.desc()).limit(1)
+    return db.scalars(stmt).first()
 
 def get_previous_utility_reading_for_chain(
     db: Session,
@@ -1073,14 +1613,92 @@ def create_utility_reading(db: Session, reading: schemas.UtilityReadingCreate, u
     data = reading.dict()
     if user_id is not None:
         data["userId"] = user_id
-    db_reading = models.UtilityReading(**data)
-    db.add(db_reading)
-    db.commit()
-    db.refresh(db_reading)
+    db_reading = db.execute(
+        insert(models.UtilityReading).values(**data).returning(models.UtilityReading)
+    ).scalar_one()
+    _commit_without_expire(db)
+    invalidate_utility_stats()
     return db_reading
 
+def bulk_create_utility_readings(
+    db: Session,
+    readings: List[schemas.UtilityReadingCreate],
+    user_id: Optional[int] = None
+) -> List[models.UtilityReading]:
+    """Create many utility readings with a single multi-row INSERT and one commit."""
+    if not readings:
+        return []
+    rows = [reading.dict() for reading in readings]
+    if user_id is not None:
+        for row in rows:
+            row["userId"] = user_id
+    # insertmanyvalues: un INSERT ... VALUES (...), (...) RETURNING per pagina, nell'ordine di input
+    db_readings = db.scalars(
+        insert(models.UtilityReading).returning(models.UtilityReading, sort_by_parameter_order=True),
+        rows
+    ).all()
+    _commit_without_expire(db)
+    invalidate_utility_stats()
+    return db_readings
+
+# Sotto questa soglia un INSERT multi-riga costa meno della preparazione del buffer per COPY
+COPY_THRESHOLD = 100
+
+def _copy_csv_field(value) -> str:
+    """Campo CSV per COPY: None come campo vuoto senza virgolette (NULL in FORMAT csv),
+    ogni altro valore tra virgolette, così una stringa vuota resta ''."""
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+def bulk_copy_utility_readings(
+    db: Session,
+    readings: List[schemas.UtilityReadingCreate],
+    user_id: Optional[int] = None
+) -> int:
+    """Import a large batch of utility readings (e.g. meter exports) without returning rows.
+
+    On PostgreSQL, batches above COPY_THRESHOLD are streamed with COPY FROM STDIN;
+    smaller batches and other databases use a plain executemany INSERT.
+    Returns the number of rows written."""
+    if not readings:
+        return 0
+    rows = [reading.dict() for reading in readings]
+    if user_id is not None:
+        for row in rows:
+            row["userId"] = user_id
+    
+    if len(rows) < COPY_THRESHOLD or not _is_postgres(db):
+        db.execute(insert(models.UtilityReading), rows)
+    else:
+        # COPY non applica i default Python delle colonne: i timestamp vanno scritti esplicitamente
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault("createdAt", now)
+            row.setdefault("updatedAt", now)
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        buffer.writelines(
+            ",".join(_copy_csv_field(row[column]) for column in columns) + "\n" for row in rows
+        )
+        buffer.seek(0)
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        # Stessa transazione della sessione: il commit sotto rende visibili le righe
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {models.UtilityReading.__tablename__} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+    
+    db.commit()
+    invalidate_utility_stats()
+    return len(rows)
+
 def update_utility_reading(db: Session, reading_id: int, reading: schemas.UtilityReadingCreate):
-    db_reading = db.query(models.UtilityReading).filter(models.UtilityReading.id == reading_id).first()
+    db_reading = db.get(models.UtilityReading, reading_id)
     if not db_reading:
         return None
 
@@ -1104,7 +1722,6 @@ def update_utility_reading(db: Session, reading_id: int, reading: schemas.Utilit
 
     db_reading.consumption = db_reading.currentReading - db_reading.previousReading
     db_reading.totalCost = db_reading.consumption * db_reading.unitCost
-    db_reading.updatedAt = datetime.utcnow()
 
     cascade_q = db.query(models.UtilityReading).filter(
         models.UtilityReading.apartmentId == db_reading.apartmentId,
@@ -1125,165 +1742,151 @@ def update_utility_reading(db: Session, reading_id: int, reading: schemas.Utilit
             raise HTTPException(status_code=400, detail=f"Reading {r.id}: current ({r.currentReading}) < previous ({r.previousReading}) after cascade")
         r.consumption = r.currentReading - r.previousReading
         r.totalCost = r.consumption * r.unitCost
-        r.updatedAt = datetime.utcnow()
         prev_current = r.currentReading
 
-    db.commit()
-    db.refresh(db_reading)
+    # I valori ricalcolati sono già sull'oggetto: commit senza expire invece di commit + refresh
+    _commit_without_expire(db)
+    invalidate_utility_stats()
     return db_reading
 
 def delete_utility_reading(db: Session, reading_id: int):
     """Delete a utility reading."""
-    db_reading = db.query(models.UtilityReading).filter(models.UtilityReading.id == reading_id).first()
-    if db_reading:
-        db.delete(db_reading)
-        db.commit()
-        return True
-    return False
+    result = db.execute(
+        delete(models.UtilityReading).where(models.UtilityReading.id == reading_id)
+    )
+    db.commit()
+    invalidate_utility_stats()
+    return result.rowcount > 0
 
 def get_utility_summary(db: Session, apartmentId: int, year: Optional[int] = None, user_id: Optional[int] = None):
     """Get utility summary for a specific apartment."""
-    # Query utilities
-    query = db.query(models.UtilityReading).filter(
-        models.UtilityReading.apartmentId == apartmentId
-    )
+    # Aggregazione nel DB: una riga per (anno, mese, tipo) invece di una per lettura
+    reading_year = func.extract('year', models.UtilityReading.readingDate)
+    reading_month = func.extract('month', models.UtilityReading.readingDate)
+    stmt = select(
+        reading_year,
+        reading_month,
+        models.UtilityReading.type,
+        func.coalesce(func.sum(models.UtilityReading.consumption), 0),
+        func.coalesce(func.sum(models.UtilityReading.totalCost), 0),
+    ).where(models.UtilityReading.apartmentId == apartmentId)
     if user_id is not None:
-        query = query.filter(models.UtilityReading.userId == user_id)
+        stmt = stmt.where(models.UtilityReading.userId == user_id)
     
     if year:
-        query = query.filter(func.extract('year', models.UtilityReading.readingDate) == year)
-    
-    readings = query.order_by(models.UtilityReading.readingDate).all()
-    
-    # Group by month and year
-    summary_dict = {}
-    for reading in readings:
-        reading_month = reading.readingDate.month
-        reading_year = reading.readingDate.year
-        key = f"{reading_year}-{reading_month}"
-        
-        if key not in summary_dict:
-            summary_dict[key] = {
-                "apartmentId": apartmentId,
-                "month": reading_month,
-                "year": reading_year,
-                "electricity": {"consumption": 0, "cost": 0},
-                "water": {"consumption": 0, "cost": 0},
-                "gas": {"consumption": 0, "cost": 0},
-                "totalCost": 0
-            }
-        
-        # Add consumption and cost based on type
-        if str(reading.type) == "electricity":
-            summary_dict[key]["electricity"]["consumption"] += reading.consumption
-            summary_dict[key]["electricity"]["cost"] += reading.totalCost
-        elif str(reading.type) == "water":
-            summary_dict[key]["water"]["consumption"] += reading.consumption
-            summary_dict[key]["water"]["cost"] += reading.totalCost
-        elif str(reading.type) == "gas":
-            summary_dict[key]["gas"]["consumption"] += reading.consumption
-            summary_dict[key]["gas"]["cost"] += reading.totalCost
-        
-        # Update total cost
-        summary_dict[key]["totalCost"] += reading.totalCost
+        stmt = stmt.where(_reading_date_in(year))
     
-    # Convert dictionary to list
-    summary_list = list(summary_dict.values())
+    rows = db.execute(
+        stmt.group_by(reading_year, reading_month, models.UtilityReading.type)
+        .order_by(reading_year, reading_month)
+    )
     
-    # Sort by year and month
-    summary_list.sort(key=lambda x: (x["year"], x["month"]))
+    # Pivot (anno, mese) -> tipo; le righe arrivano già ordinate per periodo
+    totals = defaultdict(dict)
+    for row_year, row_month, utility_type, consumption, cost in rows:
+        totals[(int(row_year), int(row_month))][utility_type] = (consumption, cost)
     
-    return summary_list
+    return [
+        {
+            "apartmentId": apartmentId,
+            "month": month,
+            "year": year_key,
+            **{
+                utility_type: dict(zip(("consumption", "cost"), by_type.get(utility_type, (0, 0))))
+                for utility_type in ("electricity", "water", "gas")
+            },
+            "totalCost": sum(values[1] for values in by_type.values())
+        }
+        for (year_key, month), by_type in totals.items()
+    ]
+
+# Campi (consumo, costo) delle statistiche per tipo di utenza; la lavanderia è un sottotipo dell'elettricità
+_UTILITY_STAT_FIELDS = {
+    "electricity": ("electricity", "electricityCost"),
+    "water": ("water", "waterCost"),
+    "gas": ("gas", "gasCost"),
+}
+_LAUNDRY_STAT_FIELDS = ("laundryElectricity", "laundryElectricityCost")
+
+def _utility_stat_columns():
+    """Somme condizionali (SUM(CASE ...)) per ogni campo statistico, etichettate col nome del campo.
+
+    Il pivot per tipo/sottotipo avviene nel DB: l'elettricità principale esclude la
+    lavanderia, che ha campi propri; totalCost somma tutte le letture.
+    """
+    reading = models.UtilityReading
+    is_electricity = reading.type == "electricity"
+    is_laundry = and_(is_electricity, reading.subtype == "laundry")
+    conditions = (
+        (_UTILITY_STAT_FIELDS["electricity"], and_(is_electricity, or_(reading.subtype.is_(None), reading.subtype != "laundry"))),
+        (_UTILITY_STAT_FIELDS["water"], reading.type == "water"),
+        (_UTILITY_STAT_FIELDS["gas"], reading.type == "gas"),
+        (_LAUNDRY_STAT_FIELDS, is_laundry),
+    )
+    columns = []
+    for (consumption_field, cost_field), condition in conditions:
+        columns.append(func.coalesce(func.sum(case((condition, reading.consumption), else_=0)), 0).label(consumption_field))
+        columns.append(func.coalesce(func.sum(case((condition, reading.totalCost), else_=0)), 0).label(cost_field))
+    columns.append(func.coalesce(func.sum(reading.totalCost), 0).label("totalCost"))
+    return columns
 
 def get_yearly_utility_statistics(db: Session, year: int, user_id: Optional[int] = None):
     """Get utility statistics for all apartments for a specific year."""
-    # Query all readings for the year
-    query = db.query(models.UtilityReading).filter(
-        func.extract('year', models.UtilityReading.readingDate) == year
+    return _cached_stats(
+        ("yearly", year, user_id),
+        lambda: _compute_yearly_utility_statistics(db, year, user_id)
     )
+
+def _compute_yearly_utility_statistics(db: Session, year: int, user_id: Optional[int] = None):
+    # Una riga già pivotata per (appartamento, mese), ordinata dal DB; il nome
+    # dell'appartamento arriva nello stesso round-trip tramite outer join
+    reading_month = func.extract('month', models.UtilityReading.readingDate)
+    stmt = select(
+        models.UtilityReading.apartmentId,
+        models.Apartment.name.label("apartmentName"),
+        reading_month.label("month"),
+        *_utility_stat_columns(),
+    ).outerjoin(
+        models.Apartment, models.Apartment.id == models.UtilityReading.apartmentId
+    ).where(_reading_date_in(year))
     if user_id is not None:
-        query = query.filter(models.UtilityReading.userId == user_id)
-    readings = query.all()
-    
-    # Group by apartment and month
-    stats_dict = {}
-    for reading in readings:
-        apartmentId = reading.apartmentId
-        month = reading.readingDate.month
-        key = f"{apartmentId}-{month}"
-        
-        if key not in stats_dict:
-            apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
-            apartment_name = apartment.name if apartment else f"Apartment {apartmentId}"
-            
-            stats_dict[key] = {
-                "month": month,
-                "year": year,
-                "apartmentId": apartmentId,
-                "apartmentName": apartment_name,
-                "electricity": 0,  # Solo elettricità principale
-                "water": 0,
-                "gas": 0,
-                "electricityCost": 0,  # Solo costo elettricità principale
-                "waterCost": 0,
-                "gasCost": 0,
-                "laundryElectricity": 0,  # Elettricità lavanderia
-                "laundryElectricityCost": 0,  # Costo elettricità lavanderia
-                "totalCost": 0
-            }
-        
-        # Add consumption and cost based on type and subtype
-        if str(reading.type) == "electricity":
-            if reading.subtype == "laundry":
-                # Elettricità lavanderia
-                stats_dict[key]["laundryElectricity"] += reading.consumption
-                stats_dict[key]["laundryElectricityCost"] += reading.totalCost
-            else:
-                # Elettricità principale (main o None)
-                stats_dict[key]["electricity"] += reading.consumption
-                stats_dict[key]["electricityCost"] += reading.totalCost
-        elif str(reading.type) == "water":
-            stats_dict[key]["water"] += reading.consumption
-            stats_dict[key]["waterCost"] += reading.totalCost
-        elif str(reading.type) == "gas":
-            stats_dict[key]["gas"] += reading.consumption
-            stats_dict[key]["gasCost"] += reading.totalCost
-        
-        # Update total cost
-        stats_dict[key]["totalCost"] += reading.totalCost
-    
-    # Convert dictionary to list
-    stats_list = list(stats_dict.values())
-    
-    # Sort by apartment ID and month
-    stats_list.sort(key=lambda x: (x["apartmentId"], x["month"]))
+        stmt = stmt.where(models.UtilityReading.userId == user_id)
+    rows = db.execute(
+        stmt.group_by(models.UtilityReading.apartmentId, models.Apartment.name, reading_month)
+        .order_by(models.UtilityReading.apartmentId, reading_month)
+    )
     
-    return stats_list
+    return [
+        {
+            **row._asdict(),
+            "month": int(row.month),
+            "year": year,
+            "apartmentName": row.apartmentName or f"Apartment {row.apartmentId}",
+        }
+        for row in rows
+    ]
 
 def get_apartment_consumption(db: Session, apartmentId: int, year: int, user_id: Optional[int] = None):
     """Get utility consumption data for a specific apartment and year."""
-    # Query all readings for the apartment and year
-    query = db.query(models.UtilityReading).filter(
+    # Una riga già pivotata per mese (stesse colonne delle statistiche annuali): al più 12 righe
+    reading_month = func.extract('month', models.UtilityReading.readingDate)
+    stmt = select(reading_month.label("month"), *_utility_stat_columns()).where(
         models.UtilityReading.apartmentId == apartmentId,
-        func.extract('year', models.UtilityReading.readingDate) == year
+        _reading_date_in(year)
     )
     if user_id is not None:
-        query = query.filter(models.UtilityReading.userId == user_id)
-    readings = query.all()
+        stmt = stmt.where(models.UtilityReading.userId == user_id)
+    rows = db.execute(stmt.group_by(reading_month)).all()
     
     # Get the apartment name
-    apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
+    apartment = db.get(models.Apartment, apartmentId)
     apartment_name = apartment.name if apartment else f"Apartment {apartmentId}"
     
     # Group by month
-    monthly_data = {}
-    for month in range(1, 13):
-        monthly_data[month] = {
+    monthly_data = {
+        month: {
             "month": month,
-            "monthName": [
-                "Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno",
-                "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre"
-            ][month - 1],
+            "monthName": month_name,
             "electricity": 0,  # Solo elettricità principale
             "water": 0,
             "gas": 0,
@@ -1294,38 +1897,19 @@ def get_apartment_consumption(db: Session, apartmentId: int, year: int, user_id:
             "laundryElectricityCost": 0,  # Costo elettricità lavanderia
             "totalCost": 0
         }
-    
-    for reading in readings:
-        month = reading.readingDate.month
-        
-        # Add consumption and cost based on type and subtype
-        if str(reading.type) == "electricity":
-            if reading.subtype == "laundry":
-                # Elettricità lavanderia
-                monthly_data[month]["laundryElectricity"] += reading.consumption
-                monthly_data[month]["laundryElectricityCost"] += reading.totalCost
-            else:
-                # Elettricità principale (main o None)
-                monthly_data[month]["electricity"] += reading.consumption
-                monthly_data[month]["electricityCost"] += reading.totalCost
-        elif str(reading.type) == "water":
-            monthly_data[month]["water"] += reading.consumption
-            monthly_data[month]["waterCost"] += reading.totalCost
-        elif str(reading.type) == "gas":
-            monthly_data[month]["gas"] += reading.consumption
-            monthly_data[month]["gasCost"] += reading.totalCost
-        
-        monthly_data[month]["totalCost"] += reading.totalCost
-    
-    # Calculate yearly totals
-    yearly_totals = {
-        "electricity": sum(month["electricity"] for month in monthly_data.values()),
-        "water": sum(month["water"] for month in monthly_data.values()),
-        "gas": sum(month["gas"] for month in monthly_data.values()),
-        "laundryElectricity": sum(month["laundryElectricity"] for month in monthly_data.values()),
-        "totalCost": sum(month["totalCost"] for month in monthly_data.values())
+        for month, month_name in enumerate(_MONTH_NAMES_IT, start=1)
     }
     
+    # Totali annui accumulati nello stesso passaggio dei dati mensili
+    yearly_totals = {"electricity": 0, "water": 0, "gas": 0, "laundryElectricity": 0, "totalCost": 0}
+    
+    for row in rows:
+        sums = row._asdict()
+        month = int(sums.pop("month"))
+        monthly_data[month].update(sums)
+        for field in yearly_totals:
+            yearly_totals[field] += sums[field]
+    
     # Create the output structure
     result = {
         "apartmentId": apartmentId,
@@ -1338,59 +1922,58 @@ def get_apartment_consumption(db: Session, apartmentId: int, year: int, user_id:
 
 def get_utility_statistics_overview(db: Session, year: Optional[int] = None, user_id: Optional[int] = None):
     """Get overall utility statistics."""
-    from datetime import datetime
-    
     if year is None:
         year = datetime.now().year
     
-    # Query all readings for the year
-    query = db.query(models.UtilityReading).filter(
-        func.extract('year', models.UtilityReading.readingDate) == year
+    return _cached_stats(
+        ("overview", year, user_id),
+        lambda: _compute_utility_statistics_overview(db, year, user_id)
     )
+
+def _compute_utility_statistics_overview(db: Session, year: int, user_id: Optional[int] = None):
+    # Somme per (mese, tipo) calcolate nel DB invece che lettura per lettura
+    reading_month = func.extract('month', models.UtilityReading.readingDate)
+    stmt = select(
+        reading_month,
+        models.UtilityReading.type,
+        func.coalesce(func.sum(models.UtilityReading.consumption), 0),
+        func.coalesce(func.sum(models.UtilityReading.totalCost), 0),
+    ).where(_reading_date_in(year))
     if user_id is not None:
-        query = query.filter(models.UtilityReading.userId == user_id)
-    readings = query.all()
-    
-    # Get all apartments
-    apartments = db.query(models.Apartment).all()
-    total_apartments = len(apartments)
+        stmt = stmt.where(models.UtilityReading.userId == user_id)
+    rows = db.execute(stmt.group_by(reading_month, models.UtilityReading.type)).all()
+    
+    # Conteggio nel DB: un intero invece di tutte le righe degli appartamenti
+    # (stessi filtri di utente e soft delete delle letture, per medie coerenti)
+    count_stmt = select(func.count(models.Apartment.id)).where(
+        models.Apartment.deletedAt.is_(None),
+        *_equal_filters(models.Apartment, userId=user_id)
+    )
+    total_apartments = db.execute(count_stmt).scalar_one()
     
     # Calculate totals
     total_consumption = {"electricity": 0, "water": 0, "gas": 0}
     total_costs = {"electricity": 0, "water": 0, "gas": 0, "total": 0}
     
     # Monthly trend data
-    monthly_trend = {}
-    for month in range(1, 13):
-        monthly_trend[month] = {
-            "month": month,
-            "monthName": [
-                "Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno",
-                "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre"
-            ][month - 1],
-            "totalConsumption": 0,
-            "totalCost": 0
-        }
+    monthly_trend = {
+        month: {"month": month, "monthName": month_name, "totalConsumption": 0, "totalCost": 0}
+        for month, month_name in enumerate(_MONTH_NAMES_IT, start=1)
+    }
     
-    for reading in readings:
-        month = reading.readingDate.month
+    for month, utility_type, consumption, cost in rows:
+        month = int(month)
         
-        # Add to totals
-        if str(reading.type) == "electricity":
-            total_consumption["electricity"] += reading.consumption
-            total_costs["electricity"] += reading.totalCost
-        elif str(reading.type) == "water":
-            total_consumption["water"] += reading.consumption
-            total_costs["water"] += reading.totalCost
-        elif str(reading.type) == "gas":
-            total_consumption["gas"] += reading.consumption
-            total_costs["gas"] += reading.totalCost
+        # Add to totals (tutta l'elettricità, lavanderia inclusa)
+        if utility_type in _UTILITY_STAT_FIELDS:
+            total_consumption[utility_type] += consumption
+            total_costs[utility_type] += cost
         
-        total_costs["total"] += reading.totalCost
+        total_costs["total"] += cost
         
         # Add to monthly trend
-        monthly_trend[month]["totalConsumption"] += reading.consumption
-        monthly_trend[month]["totalCost"] += reading.totalCost
+        monthly_trend[month]["totalConsumption"] += consumption
+        monthly_trend[month]["totalCost"] += cost
     
     # Calculate averages
     avg_divisor = max(total_apartments, 1)  # Avoid division by zero
@@ -1410,7 +1993,7 @@ def get_utility_statistics_overview(db: Session, year: Optional[int] = None, use
 
 def sync_apartment_images_with_filesystem(db: Session, apartmentId: int):
     """Sincronizza le immagini dell'appartamento nel database con quelle fisicamente presenti nel filesystem."""
-    db_apartment = db.query(models.Apartment).filter(models.Apartment.id == apartmentId).first()
+    db_apartment = db.get(models.Apartment, apartmentId)
     if not db_apartment:
         return None
     
@@ -1420,26 +2003,39 @@ def sync_apartment_images_with_filesystem(db: Session, apartmentId: int):
     # Ottieni le immagini dal database
     db_images = db_apartment.images or []
     
-    # Ottieni le immagini fisicamente presenti nel filesystem
-    existing_files = []
-    if os.path.exists(images_dir) and os.path.isdir(images_dir):
-        for filename in os.listdir(images_dir):
-            file_path = os.path.join(images_dir, filename)
-            if os.path.isfile(file_path):
-                existing_files.append(f"/apartments/{apartmentId}/{filename}")
+    # Nessuna immagine registrata: non può esserci nulla di orfano, si evita l'accesso al filesystem
+    if not db_images:
+        return {
+            "removed_orphaned_images": [],
+            "current_images": []
+        }
     
-    # Trova le immagini che sono nel database ma non nel filesystem
-    orphaned_images = [img for img in db_images if img not in existing_files]
+    # Ottieni le immagini fisicamente presenti nel filesystem: scandir fornisce il tipo
+    # di ogni voce senza uno stat() per file; il set rende O(1) i controlli di appartenenza
+    existing_files = set()
+    try:
+        with os.scandir(images_dir) as entries:
+            existing_files = {
+                f"/apartments/{apartmentId}/{entry.name}" for entry in entries if entry.is_file()
+            }
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    
+    # Separa in un solo passaggio le immagini presenti da quelle solo nel database (orfane)
+    updated_images, orphaned_images = [], []
+    for img in db_images:
+        (updated_images if img in existing_files else orphaned_images).append(img)
     
     # Rimuovi le immagini orfane dal database
     if orphaned_images:
-        print(f"Rimuovendo {len(orphaned_images)} immagini orfane per l'appartamento {apartmentId}: {orphaned_images}")
-        updated_images = [img for img in db_images if img in existing_files]
+        logger.info(
+            "Rimuovendo %d immagini orfane per l'appartamento %d: %s",
+            len(orphaned_images), apartmentId, orphaned_images
+        )
         
         setattr(db_apartment, "images", updated_images)
-        setattr(db_apartment, "updatedAt", datetime.utcnow())
         db.commit()
-        db.refresh(db_apartment)
+        invalidate_apartment_cache()
         
         return {
             "removed_orphaned_images": orphaned_images,
@@ -1451,9 +2047,67 @@ def sync_apartment_images_with_filesystem(db: Session, apartmentId: int):
         "current_images": db_images
     }
 
+def _apartment_image_files() -> Dict[int, set]:
+    """File presenti in static/apartments/<id>/ per ogni appartamento, con un'unica scansione."""
+    files_by_apartment = {}
+    try:
+        with os.scandir("static/apartments") as apartment_dirs:
+            for apartment_dir in apartment_dirs:
+                if not apartment_dir.name.isdigit() or not apartment_dir.is_dir():
+                    continue
+                with os.scandir(apartment_dir.path) as entries:
+                    files_by_apartment[int(apartment_dir.name)] = {
+                        f"/apartments/{apartment_dir.name}/{entry.name}" for entry in entries if entry.is_file()
+                    }
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return files_by_apartment
+
+def sync_all_apartment_images(db: Session, limit: int = 1000):
+    """Sincronizza le immagini di tutti gli appartamenti con il filesystem.
+
+    Una sola scansione di static/apartments, una query per le immagini registrate e un
+    UPDATE in executemany per gli appartamenti con immagini orfane, confermati con un commit.
+    """
+    files_by_apartment = _apartment_image_files()
+    apartments = db.execute(
+        select(models.Apartment.id, models.Apartment.name, models.Apartment.images)
+        .where(models.Apartment.deletedAt.is_(None))
+        .limit(limit)
+    ).all()
+    
+    updates = []
+    sync_results = []
+    for apartmentId, name, images in apartments:
+        existing_files = files_by_apartment.get(apartmentId, set())
+        updated_images, orphaned_images = [], []
+        for img in images or []:
+            (updated_images if img in existing_files else orphaned_images).append(img)
+        if orphaned_images:
+            updates.append({"id": apartmentId, "images": updated_images})
+            sync_results.append({
+                "apartment_id": apartmentId,
+                "apartment_name": name,
+                "orphaned_images_removed": orphaned_images,
+                "removed_count": len(orphaned_images)
+            })
+    
+    if updates:
+        logger.info("Rimuovendo immagini orfane da %d appartamenti", len(updates))
+        # UPDATE per chiave primaria in executemany
+        db.execute(update(models.Apartment), updates)
+        db.commit()
+        invalidate_apartment_cache()
+    
+    return {
+        "processed_apartments": len(apartments),
+        "total_orphaned_images_removed": sum(result["removed_count"] for result in sync_results),
+        "detailed_results": sync_results
+    }
+
 def sync_tenant_documents_with_filesystem(db: Session, tenantId: int):
     """Sincronizza i documenti del tenant nel database con quelli fisicamente presenti nel filesystem."""
-    db_tenant = db.query(models.Tenant).filter(models.Tenant.id == tenantId).first()
+    db_tenant = db.get(models.Tenant, tenantId)
     if not db_tenant:
         return None
     
@@ -1468,13 +2122,14 @@ def sync_tenant_documents_with_filesystem(db: Session, tenantId: int):
     orphaned_documents = []
     updated_fields = {}
     
-    # Verifica l'esistenza dell'immagine fronte
+    # Verifica l'esistenza dell'immagine fronte (isfile è già False per un percorso
+    # inesistente: un solo stat() invece di exists() + isfile())
     if front_image:
         # Rimuovi eventuali parametri di query dall'URL
         clean_front_url = front_image.split('?')[0]
         front_file_path = f"static{clean_front_url}"
         
-        if not os.path.exists(front_file_path) or not os.path.isfile(front_file_path):
+        if not os.path.isfile(front_file_path):
             orphaned_documents.append(f"front: {front_image}")
             updated_fields["documentFrontImage"] = None
     
@@ -1484,7 +2139,7 @@ def sync_tenant_documents_with_filesystem(db: Session, tenantId: int):
         clean_back_url = back_image.split('?')[0]
         back_file_path = f"static{clean_back_url}"
         
-        if not os.path.exists(back_file_path) or not os.path.isfile(back_file_path):
+        if not os.path.isfile(back_file_path):
             orphaned_documents.append(f"back: {back_image}")
             updated_fields["documentBackImage"] = None
     
@@ -1496,9 +2151,7 @@ def sync_tenant_documents_with_filesystem(db: Session, tenantId: int):
         for field, value in updated_fields.items():
             setattr(db_tenant, field, value)
         
-        setattr(db_tenant, "updatedAt", datetime.utcnow())
         db.commit()
-        db.refresh(db_tenant)
         
         return {
             "removed_orphaned_documents": orphaned_documents,
@@ -1553,7 +2206,7 @@ def get_invoices(
         elif status == "overdue":
             query = query.filter(
                 models.Invoice.isPaid == False,
-                models.Invoice.dueDate < datetime.utcnow().date()
+                models.Invoice.dueDate < _utc_today()
             )
     
     if tenant_id:
@@ -1601,7 +2254,69 @@ def get_invoices(
 
 def get_invoice(db: Session, invoice_id: int):
     """Get a specific invoice by ID."""
-    return db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+    return db.get(models.Invoice, invoice_id)
+
+def _invoice_totals(items):
+    """(subtotal, total) in un solo passaggio: subtotal = voci di affitto, total = tutte le voci."""
+    subtotal = 0
+    total = 0
+    for item in items:
+        total += item.amount
+        if item.type == 'rent':
+            subtotal += item.amount
+    return subtotal, total
+
+def _insert_invoice_items(db: Session, invoice_id: int, items, user_id: Optional[int]):
+    """Inserisce le voci della fattura con un solo INSERT multi-riga (nessun oggetto ORM)."""
+    rows = [
+        {
+            "invoiceId": invoice_id,
+            "description": item.description,
+            "amount": item.amount,
+            "type": item.type,
+            "userId": user_id,
+        }
+        for item in items
+    ]
+    # Con una lista vuota execute() inserirebbe una singola riga di default
+    if rows:
+        db.execute(insert(models.InvoiceItem), rows)
+
+def _sync_invoice_items(db: Session, invoice_id: int, items, user_id: Optional[int]):
+    """Allinea le voci della fattura a `items` scrivendo solo il delta.
+
+    Le voci sono confrontate per (descrizione, tipo): quelle uguali restano, quelle con
+    importo diverso vengono aggiornate, le nuove inserite e le mancanti eliminate.
+    """
+    existing = defaultdict(list)
+    for item_id, description, item_type, amount in db.execute(
+        select(
+            models.InvoiceItem.id,
+            models.InvoiceItem.description,
+            models.InvoiceItem.type,
+            models.InvoiceItem.amount,
+        ).where(models.InvoiceItem.invoiceId == invoice_id)
+    ):
+        existing[(description, item_type)].append((item_id, amount))
+    
+    to_insert = []
+    to_update = []
+    for item in items:
+        matches = existing.get((item.description, item.type))
+        if matches:
+            item_id, amount = matches.pop()
+            if amount != item.amount:
+                to_update.append({"id": item_id, "amount": item.amount})
+        else:
+            to_insert.append(item)
+    to_delete = [item_id for matches in existing.values() for item_id, _ in matches]
+    
+    if to_delete:
+        db.execute(delete(models.InvoiceItem).where(models.InvoiceItem.id.in_(to_delete)))
+    if to_update:
+        # UPDATE per chiave primaria in executemany
+        db.execute(update(models.InvoiceItem), to_update)
+    _insert_invoice_items(db, invoice_id, to_insert, user_id)
 
 def create_invoice(db: Session, invoice: schemas.InvoiceCreate, user_id: Optional[int] = None):
     """Create a new invoice."""
@@ -1612,11 +2327,8 @@ def create_invoice(db: Session, invoice: schemas.InvoiceCreate, user_id: Optiona
     # Create invoice items list
     items_to_create = list(invoice.items)
     
-    # subtotal = sum of RENT items only as per user request
-    subtotal = sum(item.amount for item in items_to_create if item.type == 'rent')
-    
-    # total = sum of all items (rent + utilities + fixed costs)
-    total = sum(item.amount for item in items_to_create)
+    # subtotal = RENT items only, total = all items (rent + utilities + fixed costs)
+    subtotal, total = _invoice_totals(items_to_create)
     
     # Create invoice
     db_invoice = models.Invoice(
@@ -1651,23 +2363,17 @@ def create_invoice(db: Session, invoice: schemas.InvoiceCreate, user_id: Optiona
     db.flush()  # Flush to get db_invoice.id without committing
     
     # Create invoice items
-    for item in items_to_create:
-        db_item = models.InvoiceItem(
-            invoiceId=db_invoice.id,
-            description=item.description,
-            amount=item.amount,
-            type=item.type,
-            userId=user_id if user_id is not None else None
-        )
-        db.add(db_item)
+    _insert_invoice_items(db, db_invoice.id, items_to_create, user_id)
     
-    db.commit()
-    db.refresh(db_invoice)
+    # Fattura e voci confermate insieme; i campi della fattura sono già valorizzati dal flush,
+    # le voci (non ancora caricate) si leggono in lazy load durante la serializzazione
+    _commit_without_expire(db)
+    invalidate_invoice_stats()
     return db_invoice
 
 def update_invoice(db: Session, invoice_id: int, invoice: schemas.InvoiceCreate, user_id: Optional[int] = None):
     """Update an existing invoice."""
-    db_invoice = db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+    db_invoice = db.get(models.Invoice, invoice_id)
     if not db_invoice:
         return None
     
@@ -1675,35 +2381,22 @@ def update_invoice(db: Session, invoice_id: int, invoice: schemas.InvoiceCreate,
     for key, value in invoice.dict(exclude={'items'}).items():
         setattr(db_invoice, key, value)
     
-    # Recalculate totals
-    # subtotal = Rent items
-    subtotal = sum(item.amount for item in invoice.items if item.type == 'rent')
-    db_invoice.subtotal = subtotal
-    
-    # total = sum of all items
-    db_invoice.total = sum(item.amount for item in invoice.items)
-    db_invoice.updatedAt = datetime.utcnow()
+    # Recalculate totals (subtotal = Rent items, total = all items)
+    db_invoice.subtotal, db_invoice.total = _invoice_totals(invoice.items)
     
-    # Delete existing items and create new ones
-    db.query(models.InvoiceItem).filter(models.InvoiceItem.invoiceId == invoice_id).delete()
-    
-    for item in invoice.items:
-        db_item = models.InvoiceItem(
-            invoiceId=invoice_id,
-            description=item.description,
-            amount=item.amount,
-            type=item.type,
-            userId=user_id if user_id is not None else db_invoice.userId
-        )
-        db.add(db_item)
+    # Scrive solo le differenze rispetto alle voci esistenti
+    _sync_invoice_items(
+        db, invoice_id, invoice.items, user_id if user_id is not None else db_invoice.userId
+    )
     
     db.commit()
+    invalidate_invoice_stats()
     db.refresh(db_invoice)
     return db_invoice
 
 def delete_invoice(db: Session, invoice_id: int):
     """Delete an invoice and its generated PDF."""
-    db_invoice = db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+    db_invoice = db.get(models.Invoice, invoice_id)
     if db_invoice:
         # Elimina PDF generato se esiste
         try:
@@ -1723,17 +2416,17 @@ def delete_invoice(db: Session, invoice_id: int):
 
         db.delete(db_invoice)
         db.commit()
+        invalidate_invoice_stats()
         return True
     return False
 
 def mark_invoice_as_paid(db: Session, invoice_id: int, payment_data: dict):
     """Mark an invoice as paid."""
-    db_invoice = db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+    db_invoice = db.get(models.Invoice, invoice_id)
     if not db_invoice:
         return None
     
     db_invoice.isPaid = True
-    db_invoice.updatedAt = datetime.utcnow()
     
     # Create a PaymentRecord if needed or if data is provided
     # This aligns with the new system where root payment fields are removed
@@ -1749,17 +2442,17 @@ def mark_invoice_as_paid(db: Session, invoice_id: int, payment_data: dict):
     db.add(payment_record)
     
     db.commit()
+    invalidate_invoice_stats()
     db.refresh(db_invoice)
     return db_invoice
 
 def add_payment_record(db: Session, invoice_id: int, payment_record: schemas.PaymentRecordCreate, user_id: Optional[int] = None):
     """Add a payment record to an invoice."""
-    db_invoice = db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+    db_invoice = db.get(models.Invoice, invoice_id)
     if not db_invoice:
         return None
     
     db_invoice.isPaid = True
-    db_invoice.updatedAt = datetime.utcnow()
     
     db_payment = models.PaymentRecord(
         invoiceId=invoice_id,
@@ -1773,6 +2466,7 @@ def add_payment_record(db: Session, invoice_id: int, payment_record: schemas.Pay
     
     db.add(db_payment)
     db.commit()
+    invalidate_invoice_stats()
     db.refresh(db_payment)
     return db_payment
 
@@ -1801,7 +2495,6 @@ def send_invoice_reminder(db: Session, invoice_id: int, reminder_data: dict, use
     # Update reminder status
     db_invoice.reminderSent = True
     db_invoice.reminderDate = datetime.utcnow().date()
-    db_invoice.updatedAt = datetime.utcnow()
     
     db.commit()
     
@@ -1816,7 +2509,7 @@ def send_invoice_reminder(db: Session, invoice_id: int, reminder_data: dict, use
 
 def get_overdue_invoices(db: Session, days_overdue: int = 7, include_tenant_info: bool = True, user_id: Optional[int] = None):
     """Get overdue invoices."""
-    cutoff_date = datetime.utcnow().date() - timedelta(days=days_overdue)
+    cutoff_date = _utc_today() - timedelta(days=days_overdue)
     
     query = db.query(models.Invoice).filter(
         models.Invoice.isPaid == False,
@@ -1832,36 +2525,37 @@ def get_overdue_invoices(db: Session, days_overdue: int = 7, include_tenant_info
 
 def generate_monthly_invoices(db: Session, data: dict):
     """Generate monthly invoices for all active leases."""
-    month = data.get('month', datetime.utcnow().month)
-    year = data.get('year', datetime.utcnow().year)
+    # Un solo timestamp per chiamata, riusato per tutti i contratti del ciclo
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    month = data.get('month', now.month)
+    year = data.get('year', now.year)
     include_utilities = data.get('include_utilities', True)
     send_notifications = data.get('send_notifications', False)
     
     # Get active leases
     active_leases = db.query(models.Lease).filter(
-        models.Lease.endDate >= datetime.utcnow().date()
+        models.Lease.endDate >= today
     ).all()
     
+    # Contratti già fatturati per il mese/anno: una sola query invece di una per contratto
+    invoiced_lease_ids = set(db.scalars(
+        select(models.Invoice.leaseId).where(
+            models.Invoice.month == month,
+            models.Invoice.year == year
+        )
+    ))
+    rent_month_name = _MONTH_NAMES_IT[month - 1]
+    
     generated_count = 0
     total_amount = 0
     
     for lease in active_leases:
         # Check if invoice already exists for this month/year
-        existing_invoice = db.query(models.Invoice).filter(
-            models.Invoice.leaseId == lease.id,
-            models.Invoice.month == month,
-            models.Invoice.year == year
-        ).first()
-        
-        if existing_invoice:
+        if lease.id in invoiced_lease_ids:
             continue
         
         # Create invoice items
-        rent_month_name = [
-            "", "Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno",
-            "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre"
-        ][month]
-        
         items = [
             schemas.InvoiceItemCreate(
                 invoiceId=0,
@@ -1883,8 +2577,8 @@ def generate_monthly_invoices(db: Session, data: dict):
             invoiceNumber="",  # Will be auto-generated
             month=month,
             year=year,
-            issueDate=datetime.utcnow().date(),
-            dueDate=datetime.utcnow().date() + timedelta(days=15),
+            issueDate=today,
+            dueDate=today + timedelta(days=15),
             notes=f"Fattura automatica per {rent_month_name} {year}",
             items=items
         )
@@ -1902,20 +2596,19 @@ def generate_monthly_invoices(db: Session, data: dict):
 def generate_invoice_from_lease(db: Session, data: dict):
     """Generate an invoice from a specific lease."""
     lease_id = data.get('lease_id')
-    month = data.get('month', datetime.utcnow().month)
-    year = data.get('year', datetime.utcnow().year)
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    month = data.get('month', now.month)
+    year = data.get('year', now.year)
     include_utilities = data.get('include_utilities', True)
     custom_items = data.get('custom_items', [])
     
-    lease = db.query(models.Lease).filter(models.Lease.id == lease_id).first()
+    lease = db.get(models.Lease, lease_id)
     if not lease:
         return {"error": "Lease not found"}
     
     # Create invoice items
-    rent_month_name = [
-        "", "Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno",
-        "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre"
-    ][month]
+    rent_month_name = _MONTH_NAMES_IT[month - 1]
     
     items = [
         schemas.InvoiceItemCreate(
@@ -1947,8 +2640,8 @@ def generate_invoice_from_lease(db: Session, data: dict):
         invoiceNumber="",
         month=month,
         year=year,
-        issueDate=datetime.utcnow().date(),
-        dueDate=datetime.utcnow().date() + timedelta(days=15),
+        issueDate=today,
+        dueDate=today + timedelta(days=15),
         notes=f"Fattura generata da contratto per {rent_month_name} {year}",
         items=items
     )
@@ -1962,52 +2655,52 @@ def generate_invoice_from_lease(db: Session, data: dict):
         "message": "Fattura generata con successo"
     }
 
-def get_invoice_statistics(db: Session, period: str = "this_month", user_id: Optional[int] = None):
-    """Get invoice statistics and KPI."""
-    today = datetime.utcnow().date()
-    
+def _invoice_period_window(period: str, today: date):
+    """Intervallo (inizio, fine) delle date di emissione per il periodo richiesto."""
     if period == "this_month":
-        start_date = today.replace(day=1)
-        end_date = today
-    elif period == "last_month":
+        return today.replace(day=1), today
+    if period == "last_month":
         if today.month == 1:
             start_date = today.replace(year=today.year-1, month=12, day=1)
         else:
             start_date = today.replace(month=today.month-1, day=1)
         end_date = start_date.replace(day=28) + timedelta(days=4)
-        end_date = end_date.replace(day=1) - timedelta(days=1)
-    elif period == "this_year":
-        start_date = today.replace(month=1, day=1)
-        end_date = today
-    else:  # all
-        start_date = date(2020, 1, 1)
-        end_date = today
-    
-    # Get invoices for the period
-    query = db.query(models.Invoice).filter(
-        models.Invoice.issueDate >= start_date,
-        models.Invoice.issueDate <= end_date
+        return start_date, end_date.replace(day=1) - timedelta(days=1)
+    if period == "this_year":
+        return today.replace(month=1, day=1), today
+    # all
+    return date(2020, 1, 1), today
+
+def get_invoice_statistics(db: Session, period: str = "this_month", user_id: Optional[int] = None):
+    """Get invoice statistics and KPI."""
+    today = _utc_today()
+    # La data fa parte della chiave: il conteggio delle scadute cambia a ogni cambio di giorno
+    return _cached(
+        _invoice_stats_cache,
+        (period, today, user_id),
+        lambda: _compute_invoice_statistics(db, period, today, user_id)
+    )
+
+def _compute_invoice_statistics(db: Session, period: str, today: date, user_id: Optional[int] = None):
+    start_date, end_date = _invoice_period_window(period, today)
+    
+    # Tutti i KPI in un'unica query aggregata: somme e conteggi condizionali invece di
+    # caricare le fatture del periodo e sommarle in Python
+    invoice = models.Invoice
+    in_period = and_(invoice.issueDate >= start_date, invoice.issueDate <= end_date)
+    is_overdue = and_(invoice.isPaid == False, invoice.dueDate < today)
+    in_this_month = and_(invoice.issueDate >= today.replace(day=1), invoice.issueDate <= today)
+    stmt = select(
+        func.coalesce(func.sum(case((in_period, invoice.total), else_=0)), 0),
+        func.coalesce(func.sum(case((and_(in_period, invoice.isPaid == True), invoice.total), else_=0)), 0),
+        func.count(case((is_overdue, invoice.id))),
+        func.count(case((in_this_month, invoice.id))),
     )
     if user_id is not None:
-        query = query.filter(models.Invoice.userId == user_id)
-    invoices = query.all()
-    
-    total_invoiced = sum(inv.total for inv in invoices)
-    total_paid = sum(inv.total for inv in invoices if inv.isPaid)
+        stmt = stmt.where(invoice.userId == user_id)
+    total_invoiced, total_paid, overdue_invoices, this_month_invoices = db.execute(stmt).one()
     total_unpaid = total_invoiced - total_paid
     
-    # Count overdue invoices
-    overdue_invoices = db.query(models.Invoice).filter(
-        models.Invoice.isPaid == False,
-        models.Invoice.dueDate < today
-    ).count()
-    
-    # This month invoices
-    this_month_invoices = db.query(models.Invoice).filter(
-        models.Invoice.issueDate >= today.replace(day=1),
-        models.Invoice.issueDate <= today
-    ).count()
-    
     return {
         "total_invoiced": total_invoiced,
         "total_paid": total_paid,
@@ -2022,7 +2715,7 @@ def get_invoice_statistics(db: Session, period: str = "this_month", user_id: Opt
 def generate_invoice_pdf(db: Session, invoice_id: int, include_logo: bool = True, 
                         include_qr_code: bool = True, include_payment_instructions: bool = True):
     """Generate PDF for an invoice."""
-    invoice = db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+    invoice = db.get(models.Invoice, invoice_id)
     if not invoice:
         return None
     
@@ -2120,7 +2813,10 @@ def get_lease_invoices(
     user_id: Optional[int] = None
 ):
     """Get invoices for a lease with optional filters."""
-    query = db.query(models.Invoice).filter(
+    query = db.query(models.Invoice).options(
+        selectinload(models.Invoice.items),
+        selectinload(models.Invoice.payments)
+    ).filter(
         models.Invoice.leaseId == leaseId
     )
     if user_id is not None:
@@ -2141,13 +2837,18 @@ def calculate_utility_costs(db: Session, apartment_id: int, month: int, year: in
     """Calculate utility costs for a specific month and year."""
     # This is kept for backward compatibility if needed, 
     # but get_detailed_utility_and_fixed_items is preferred now.
-    apartment = db.query(models.Apartment).filter(models.Apartment.id == apartment_id).first()
+    apartment = db.get(models.Apartment, apartment_id)
     
-    readings = db.query(models.UtilityReading).filter(
+    # Solo le tre colonne usate, lette a blocchi: niente oggetti ORM né lista completa in memoria
+    readings = db.query(
+        models.UtilityReading.type,
+        models.UtilityReading.subtype,
+        models.UtilityReading.totalCost
+    ).filter(
         models.UtilityReading.apartmentId == apartment_id,
         models.UtilityReading.readingDate >= date(year, month, 1),
         models.UtilityReading.readingDate <= date(year, month, 28) + timedelta(days=4)
-    ).all()
+    ).yield_per(1000)
     
     costs = {
         "electricity": 0.0,
@@ -2160,21 +2861,21 @@ def calculate_utility_costs(db: Session, apartment_id: int, month: int, year: in
     if is_apartment_8:
         electricity_main = 0.0
         electricity_laundry = 0.0
-        for reading in readings:
-            if reading.type == "electricity":
-                if reading.subtype == "laundry":
-                    electricity_laundry += reading.totalCost
+        for utility_type, subtype, total_cost in readings:
+            if utility_type == "electricity":
+                if subtype == "laundry":
+                    electricity_laundry += total_cost
                 else:
-                    electricity_main += reading.totalCost
-            elif reading.type in costs:
-                costs[reading.type] += reading.totalCost
+                    electricity_main += total_cost
+            elif utility_type in costs:
+                costs[utility_type] += total_cost
         costs["electricity"] = electricity_main
         if electricity_laundry > 0:
             costs["electricity_laundry"] = electricity_laundry
     else:
-        for reading in readings:
-            if reading.type in costs:
-                costs[reading.type] += reading.totalCost
+        for utility_type, _, total_cost in readings:
+            if utility_type in costs:
+                costs[utility_type] += total_cost
     return costs
 
 def get_detailed_utility_and_fixed_items(db: Session, apartment_id: int, month: int, year: int, user_id: int) -> List[schemas.InvoiceItemCreate]:
@@ -2186,13 +2887,24 @@ def get_detailed_utility_and_fixed_items(db: Session, apartment_id: int, month:
         prev_month = 12
         prev_year = year - 1
     
-    readings = db.query(models.UtilityReading).filter(
-        models.UtilityReading.apartmentId == apartment_id,
-        models.UtilityReading.readingDate >= date(prev_year, prev_month, 1),
-        models.UtilityReading.readingDate <= date(prev_year, prev_month, 28) + timedelta(days=4)
+    # Righe Core con le sole colonne usate per le voci di fattura
+    readings = db.execute(
+        select(
+            models.UtilityReading.type,
+            models.UtilityReading.subtype,
+            models.UtilityReading.currentReading,
+            models.UtilityReading.previousReading,
+            models.UtilityReading.consumption,
+            models.UtilityReading.unitCost,
+            models.UtilityReading.totalCost,
+        ).where(
+            models.UtilityReading.apartmentId == apartment_id,
+            models.UtilityReading.readingDate >= date(prev_year, prev_month, 1),
+            models.UtilityReading.readingDate <= date(prev_year, prev_month, 28) + timedelta(days=4)
+        )
     ).all()
     
-    apartment = db.query(models.Apartment).filter(models.Apartment.id == apartment_id).first()
+    apartment = db.get(models.Apartment, apartment_id)
     
     items = []
     type_labels = {
@@ -2238,26 +2950,26 @@ def get_detailed_utility_and_fixed_items(db: Session, apartment_id: int, month:
 
 def get_laundry_electricity_cost_for_month(db: Session, apartment_id: int, month: int, year: int):
     """Get laundry electricity cost for a specific apartment, month and year."""
-    readings = db.query(models.UtilityReading).filter(
-        models.UtilityReading.apartmentId == apartment_id,
-        models.UtilityReading.type == "electricity",
-        models.UtilityReading.subtype == "laundry",
-        models.UtilityReading.readingDate >= date(year, month, 1),
-        models.UtilityReading.readingDate <= date(year, month, 28) + timedelta(days=4)
-    ).all()
-    
-    return sum(reading.totalCost for reading in readings)
+    return db.execute(
+        select(func.coalesce(func.sum(models.UtilityReading.totalCost), 0)).where(
+            models.UtilityReading.apartmentId == apartment_id,
+            models.UtilityReading.type == "electricity",
+            models.UtilityReading.subtype == "laundry",
+            models.UtilityReading.readingDate >= date(year, month, 1),
+            models.UtilityReading.readingDate <= date(year, month, 28) + timedelta(days=4)
+        )
+    ).scalar_one()
 
 def get_laundry_electricity_cost_for_apartment(db: Session, apartment_id: int, year: int):
     """Get total laundry electricity cost for a specific apartment and year."""
-    readings = db.query(models.UtilityReading).filter(
-        models.UtilityReading.apartmentId == apartment_id,
-        models.UtilityReading.type == "electricity",
-        models.UtilityReading.subtype == "laundry",
-        func.extract('year', models.UtilityReading.readingDate) == year
-    ).all()
-    
-    return sum(reading.totalCost for reading in readings)
+    return db.execute(
+        select(func.coalesce(func.sum(models.UtilityReading.totalCost), 0)).where(
+            models.UtilityReading.apartmentId == apartment_id,
+            models.UtilityReading.type == "electricity",
+            models.UtilityReading.subtype == "laundry",
+            _reading_date_in(year)
+        )
+    ).scalar_one()
 
 
 # ----- ID Management Services -----
@@ -2297,11 +3009,7 @@ def free_id_for_reuse(db: Session, table_name: str, freed_id: int):
 
 def soft_delete_entity(db: Session, model_class, entity_id: int, user_id: int):
     """Perform soft delete on an entity and free its ID for reuse."""
-    entity = db.query(model_class).filter(
-        model_class.id == entity_id,
-        model_class.userId == user_id,
-        model_class.deletedAt.is_(None)
-    ).first()
+    entity = _get(db, model_class, entity_id, user_id)
 
     if not entity:
         return None
@@ -2309,6 +3017,10 @@ def soft_delete_entity(db: Session, model_class, entity_id: int, user_id: int):
     # Soft delete
     entity.deletedAt = datetime.utcnow()
     db.commit()
+    if model_class is models.Apartment:
+        invalidate_apartment_cache()
+    elif model_class is models.Invoice:
+        invalidate_invoice_stats()
 
     # Free the ID for reuse
     table_name = model_class.__tablename__
@@ -2334,16 +3046,16 @@ def create_entity_with_custom_id(db: Session, model_class, data: Dict[str, Any],
         data['userId'] = user_id
         entity = model_class(**data)
         db.add(entity)
-        db.commit()
-        db.refresh(entity)
+        # PK e default Python sono già sull'oggetto dopo il flush: niente refresh
+        _commit_without_expire(db)
         return entity
     else:
         # No freed ID, let database handle auto-increment
         data['userId'] = user_id
         entity = model_class(**data)
         db.add(entity)
-        db.commit()
-        db.refresh(entity)
+        # PK e default Python sono già sull'oggetto dopo il flush: niente refresh
+        _commit_without_expire(db)
         return entity
 
 
@@ -2359,20 +3071,12 @@ def get_entities_for_user(db: Session, model_class, user_id: int, skip: int = 0,
 
 def get_entity_for_user(db: Session, model_class, entity_id: int, user_id: int):
     """Get a specific entity for a user (excluding soft-deleted)."""
-    return db.query(model_class).filter(
-        model_class.id == entity_id,
-        model_class.userId == user_id,
-        model_class.deletedAt.is_(None)
-    ).first()
+    return _get(db, model_class, entity_id, user_id)
 
 
 def update_entity_for_user(db: Session, model_class, entity_id: int, update_data: Dict[str, Any], user_id: int):
     """Update an entity for a specific user."""
-    entity = db.query(model_class).filter(
-        model_class.id == entity_id,
-        model_class.userId == user_id,
-        model_class.deletedAt.is_(None)
-    ).first()
+    entity = _get(db, model_class, entity_id, user_id)
 
     if not entity:
         return None
@@ -2381,9 +3085,12 @@ def update_entity_for_user(db: Session, model_class, entity_id: int, update_data
         if hasattr(entity, key):
             setattr(entity, key, value)
 
-    entity.updatedAt = datetime.utcnow()
-    db.commit()
-    db.refresh(entity)
+    # Gli attributi aggiornati restano validi; solo quelli calcolati dal DB (updatedAt) si ricaricano se letti
+    _commit_without_expire(db)
+    if model_class is models.Apartment:
+        invalidate_apartment_cache()
+    elif model_class is models.Invoice:
+        invalidate_invoice_stats()
     return entity
 
 
@@ -2394,10 +3101,6 @@ def delete_entity_for_user(db: Session, model_class, entity_id: int, user_id: in
 
 # ----- Auto-Invoice Generation -----
 
-import logging
-logger = logging.getLogger(__name__)
-
-
 def create_entry_invoice(db: Session, lease, user_id: int):
     """
     Genera automaticamente una fattura di ingresso (caparra) alla creazione del contratto.
@@ -2411,14 +3114,14 @@ def create_entry_invoice(db: Session, lease, user_id: int):
         return None
 
     # Recupera il nome dell'appartamento per la descrizione
-    apartment = db.query(models.Apartment).filter(models.Apartment.id == lease.apartmentId).first()
+    apartment = db.get(models.Apartment, lease.apartmentId)
     apt_name = apartment.name if apartment else f"Apt {lease.apartmentId}"
 
     issue_date = lease.startDate
     due_date = issue_date + timedelta(days=10)
 
     # Genera invoice number con prefisso CAP-
-    timestamp = int(datetime.utcnow().timestamp() * 1000)
+    timestamp = time.time_ns() // 1_000_000
     invoice_number = f"CAP-{timestamp}-{lease.id}"
 
     # Crea la fattura
@@ -2450,6 +3153,7 @@ def create_entry_invoice(db: Session, lease, user_id: int):
     db.add(db_item)
 
     db.commit()
+    invalidate_invoice_stats()
     db.refresh(db_invoice)
 
     logger.info(f"Fattura ingresso {invoice_number} generata per lease {lease.id}, importo {lease.securityDeposit}")
@@ -2557,14 +3261,11 @@ def check_and_generate_monthly_invoice(db: Session, apartment_id: int, user_id:
     # Genera invoice number
     invoice_number = generate_invoice_number(db)
 
-    # Nomi mesi in italiano
-    month_names = [
-        "", "Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno",
-        "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre"
-    ]
+    # Nome del mese in italiano
+    invoice_month_name = _MONTH_NAMES_IT[invoice_month - 1]
 
     # Recupera nome appartamento
-    apartment = db.query(models.Apartment).filter(models.Apartment.id == apartment_id).first()
+    apartment = db.get(models.Apartment, apartment_id)
     apt_name = apartment.name if apartment else f"Apt {apartment_id}"
 
     # Costruisci gli items
@@ -2572,7 +3273,7 @@ def check_and_generate_monthly_invoice(db: Session, apartment_id: int, user_id:
 
     # Item 1: Affitto
     items_data.append({
-        "description": f"Affitto {month_names[invoice_month]} {invoice_year}",
+        "description": f"Affitto {invoice_month_name} {invoice_year}",
         "amount": lease.monthlyRent,
         "type": "rent"
     })
@@ -2658,7 +3359,7 @@ def check_and_generate_monthly_invoice(db: Session, apartment_id: int, user_id:
         subtotal=round(util_subtotal, 2),
         tax=0.0,
         total=round(total, 2),
-        notes=f"Fattura generata automaticamente - {month_names[invoice_month]} {invoice_year}",
+        notes=f"Fattura generata automaticamente - {invoice_month_name} {invoice_year}",
         userId=user_id
     )
     db.add(db_invoice)
@@ -2681,9 +3382,9 @@ def check_and_generate_monthly_invoice(db: Session, apartment_id: int, user_id:
     lease.gasReadingId = next_readings["gas"].id
     if next_laundry:
         lease.electricityLaundryReadingId = next_laundry.id
-    lease.updatedAt = datetime.utcnow()
 
     db.commit()
+    invalidate_invoice_stats()
     db.refresh(db_invoice)
 
     logger.info(
@@ -2805,7 +3506,6 @@ def cascade_update_invoice_for_reading(db: Session, reading_id: int, user_id: in
         if item.type == invoice_item_type:
             item.amount = cost
             item.description = new_description
-            item.updatedAt = datetime.utcnow()
             item_updated = True
             break
 
@@ -2822,9 +3522,9 @@ def cascade_update_invoice_for_reading(db: Session, reading_id: int, user_id: in
 
     recent_invoice.subtotal = round(util_subtotal, 2)
     recent_invoice.total = round(total, 2)
-    recent_invoice.updatedAt = datetime.utcnow()
 
     db.commit()
+    invalidate_invoice_stats()
     db.refresh(recent_invoice)
 
     logger.info(
@@ -0,0 +1,51 @@
+"""Add pg_trgm GIN indexes for ILIKE search
+
+Revision ID: 4f2a9c7e1b3d
+Revises: dc6d2997f252
+Create Date: 2026-10-16 09:12:40.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2a9c7e1b3d'
+down_revision: Union[str, None] = 'dc6d2997f252'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRGM_INDEXES = [
+    ('ix_apartments_name_trgm', 'apartments', 'name'),
+    ('ix_apartments_description_trgm', 'apartments', 'description'),
+    ('ix_tenants_firstName_trgm', 'tenants', 'firstName'),
+    ('ix_tenants_lastName_trgm', 'tenants', 'lastName'),
+    ('ix_tenants_email_trgm', 'tenants', 'email'),
+    ('ix_tenants_documentNumber_trgm', 'tenants', 'documentNumber'),
+]
+
+
+def upgrade() -> None:
+    # Gli indici trigram esistono solo su PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(
+            name, table, [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, table, _ in reversed(TRGM_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,31 @@
+"""Add covering index on leases.endDate
+
+Revision ID: 8c3e5d1a9f47
+Revises: 4f2a9c7e1b3d
+Create Date: 2026-10-16 10:02:17.554190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3e5d1a9f47'
+down_revision: Union[str, None] = '4f2a9c7e1b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # INCLUDE viene ignorato dai dialetti diversi da PostgreSQL
+    op.create_index(
+        'ix_leases_endDate_covering', 'leases', ['endDate'],
+        unique=False,
+        postgresql_include=['tenantId', 'apartmentId', 'startDate']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leases_endDate_covering', table_name='leases')
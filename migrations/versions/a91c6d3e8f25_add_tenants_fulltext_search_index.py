@@ -0,0 +1,43 @@
+"""Add full-text GIN index for tenant search
+
+Revision ID: a91c6d3e8f25
+Revises: e3a8f5c21d64
+Create Date: 2026-10-16 13:05:51.640319
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91c6d3e8f25'
+down_revision: Union[str, None] = 'e3a8f5c21d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Deve coincidere con models.TENANT_SEARCH_VECTOR_SQL
+TENANT_SEARCH_VECTOR_SQL = (
+    "to_tsvector('simple', coalesce(\"firstName\", '') || ' ' || coalesce(\"lastName\", '') || ' ' || "
+    "coalesce(email, '') || ' ' || coalesce(\"documentNumber\", ''))"
+)
+
+
+def upgrade() -> None:
+    # Indice su espressione, senza colonna generata: solo PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_tenants_search_tsv ON tenants "
+        f"USING gin ({TENANT_SEARCH_VECTOR_SQL})"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_tenants_search_tsv")
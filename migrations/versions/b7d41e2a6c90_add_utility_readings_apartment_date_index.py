@@ -0,0 +1,31 @@
+"""Add composite index on utility_readings (apartmentId, readingDate)
+
+Revision ID: b7d41e2a6c90
+Revises: 8c3e5d1a9f47
+Create Date: 2026-10-16 11:24:08.310527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e2a6c90'
+down_revision: Union[str, None] = '8c3e5d1a9f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Serve i filtri per intervallo di readingDate e l'ORDER BY readingDate DESC per appartamento
+    op.create_index(
+        'ix_utility_readings_apartmentId_readingDate', 'utility_readings',
+        ['apartmentId', 'readingDate'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_utility_readings_apartmentId_readingDate', table_name='utility_readings')
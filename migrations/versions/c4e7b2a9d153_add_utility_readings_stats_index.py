@@ -0,0 +1,33 @@
+"""Add covering index on utility_readings for yearly statistics
+
+Revision ID: c4e7b2a9d153
+Revises: a91c6d3e8f25
+Create Date: 2026-10-16 14:21:37.882064
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7b2a9d153'
+down_revision: Union[str, None] = 'a91c6d3e8f25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # I filtri per anno sono range su readingDate: nessun indice su EXTRACT necessario.
+    # INCLUDE viene ignorato dai dialetti diversi da PostgreSQL
+    op.create_index(
+        'ix_utility_readings_readingDate_type_apartmentId', 'utility_readings',
+        ['readingDate', 'type', 'apartmentId'],
+        unique=False,
+        postgresql_include=['subtype', 'userId', 'consumption', 'totalCost']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_utility_readings_readingDate_type_apartmentId', table_name='utility_readings')
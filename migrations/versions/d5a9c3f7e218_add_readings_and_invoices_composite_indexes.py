@@ -0,0 +1,39 @@
+"""Add composite indexes on utility_readings and invoices for filtered getters
+
+Revision ID: d5a9c3f7e218
+Revises: f6b2d8e4a137
+Create Date: 2026-10-16 16:48:03.125964
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a9c3f7e218'
+down_revision: Union[str, None] = 'f6b2d8e4a137'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    # Ultima/precedente lettura per (appartamento, tipo, sottotipo) ordinata per readingDate
+    ('ix_utility_readings_apartmentId_type_subtype_readingDate', 'utility_readings',
+     ['apartmentId', 'type', 'subtype', 'readingDate']),
+    # Fatture per inquilino / appartamento / contratto filtrate per anno e mese
+    ('ix_invoices_tenantId_year_month', 'invoices', ['tenantId', 'year', 'month']),
+    ('ix_invoices_apartmentId_year_month', 'invoices', ['apartmentId', 'year', 'month']),
+    ('ix_invoices_leaseId_year_month', 'invoices', ['leaseId', 'year', 'month']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,36 @@
+"""Add composite indexes on leases for apartment and tenant lookups
+
+Revision ID: e3a8f5c21d64
+Revises: b7d41e2a6c90
+Create Date: 2026-10-16 11:52:40.918263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a8f5c21d64'
+down_revision: Union[str, None] = 'b7d41e2a6c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # "Attivo" equivale a endDate > oggi: la colonna endDate nell'indice sostituisce il flag
+    op.create_index(
+        'ix_leases_apartmentId_endDate', 'leases', ['apartmentId', 'endDate'],
+        unique=False,
+        postgresql_include=['tenantId']
+    )
+    op.create_index(
+        'ix_leases_tenantId_startDate', 'leases', ['tenantId', 'startDate'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leases_tenantId_startDate', table_name='leases')
+    op.drop_index('ix_leases_apartmentId_endDate', table_name='leases')
@@ -0,0 +1,39 @@
+"""Add covering and partial indexes on invoices for KPIs and overdue lookups
+
+Revision ID: e8b3f1c6a472
+Revises: d5a9c3f7e218
+Create Date: 2026-10-16 18:02:54.417391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3f1c6a472'
+down_revision: Union[str, None] = 'd5a9c3f7e218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # INCLUDE e WHERE vengono ignorati dai dialetti diversi da PostgreSQL
+    op.create_index(
+        'ix_invoices_userId_issueDate_covering', 'invoices',
+        ['userId', 'issueDate'],
+        unique=False,
+        postgresql_include=['isPaid', 'total', 'dueDate']
+    )
+    op.create_index(
+        'ix_invoices_dueDate_unpaid', 'invoices',
+        ['dueDate'],
+        unique=False,
+        postgresql_where=sa.text('NOT "isPaid"')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoices_dueDate_unpaid', table_name='invoices')
+    op.drop_index('ix_invoices_userId_issueDate_covering', table_name='invoices')
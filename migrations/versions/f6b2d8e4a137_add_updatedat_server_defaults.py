@@ -0,0 +1,42 @@
+"""Add now() server default to updatedAt on apartments, tenants, leases and utility_readings
+
+Revision ID: f6b2d8e4a137
+Revises: c4e7b2a9d153
+Create Date: 2026-10-16 16:05:12.447391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b2d8e4a137'
+down_revision: Union[str, None] = 'c4e7b2a9d153'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ['apartments', 'tenants', 'leases', 'utility_readings']
+
+
+def upgrade() -> None:
+    # updatedAt valorizzato dal DB anche per INSERT che non passano dall'ORM.
+    # Colonne naive in UTC come i default Python (datetime.utcnow): su PostgreSQL
+    # now() è nel fuso della sessione e va convertito
+    if op.get_bind().dialect.name == 'postgresql':
+        default = sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+    else:
+        default = sa.text('CURRENT_TIMESTAMP')
+    for table in TABLES:
+        op.alter_column(table, 'updatedAt',
+               existing_type=sa.DateTime(),
+               server_default=default)
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.alter_column(table, 'updatedAt',
+               existing_type=sa.DateTime(),
+               server_default=None)